@@ -0,0 +1,112 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+import numpy as np
+from PIL import Image
+from pyrpoc.helpers.pixel_reduce import reduce_pixels
+
+# compiled ttl buffers keyed by galvo geometry + do lines + mask content + line phase, so static-mask frames are free
+_CACHE_SIZE = 8
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def parse_do_line(chan):
+    # 'port0/line4' -> ('port0', 4)
+    match = re.match(r'^\s*(port\d+)/line(\d+)\s*$', chan)
+    if match is None:
+        raise ValueError(f"Modulation channel '{chan}' must be a single digital line, e.g. port0/line4.")
+    return match.group(1), int(match.group(2))
+
+
+def port_groups(do_chans):
+    # all lines on the same port share one channel and one uint32 word per sample
+    groups = OrderedDict()
+    for idx, chan in enumerate(do_chans):
+        port, line = parse_do_line(chan)
+        groups.setdefault(port, []).append((idx, line))
+    return groups
+
+
+def port_channel_names(device, do_chans):
+    return [
+        ", ".join(f"{device}/{port}/line{line}" for _, line in lines)
+        for port, lines in port_groups(do_chans).items()
+    ]
+
+
+def mask_digest(mask):
+    m_arr = np.asarray(mask)
+    return (m_arr.shape, hashlib.blake2b(np.ascontiguousarray(m_arr).view(np.uint8), digest_size=16).digest())
+
+
+def compile_do(galvo, do_chans, mod_masks, line_phase=0):
+    # returns a read-only (n_ports, total_samples) uint32 array, one packed port word per sample
+    # line_phase is the bidirectional shift the frames are reduced with, ignored for unidirectional scans
+    line_phase = int(line_phase or 0) if galvo.bidirectional else 0
+    key = (galvo.scan_key(), tuple(do_chans), tuple(mask_digest(m) for m in mod_masks), line_phase)
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+
+    words = pack_ports(galvo, do_chans, mod_masks, line_phase)
+    if galvo.bidirectional:
+        check_alignment(galvo, do_chans, mod_masks, words, line_phase)
+    words.setflags(write=False)
+
+    with _cache_lock:
+        _cache[key] = words
+        while len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+    return words
+
+
+def pack_ports(galvo, do_chans, mod_masks, line_phase=0):
+    groups = port_groups(do_chans)
+    left = galvo.extrasteps_left
+    words = np.zeros((len(groups), galvo.total_y, galvo.total_x), dtype=np.uint32)
+
+    for p, lines in enumerate(groups.values()):
+        contained = words[p, :, left:left + galvo.numsteps_x]
+        for idx, line in lines:
+            m = mod_masks[idx]
+            m_arr = np.asarray(m) if isinstance(m, Image.Image) else m
+            if m_arr.shape != contained.shape:
+                raise ValueError(f"Mask for {do_chans[idx]} is {m_arr.shape[1]} by {m_arr.shape[0]}, expected {galvo.numsteps_x} by {galvo.numsteps_y}.")
+            # port-format writes put each line's state at its bit position within the port
+            contained |= (m_arr > 0).astype(np.uint32) << np.uint32(line)
+
+    if galvo.bidirectional:
+        # backward rows run right to left and the reduction reads their image column x from raw column
+        # total_x - left - line_phase - 1 - x, so the words are mirrored and shifted onto those columns
+        words[:, 1::2] = np.roll(words[:, 1::2, ::-1], -line_phase, axis=-1)
+
+    if galvo.pixel_map is not None:
+        # variable dwell, every pixel holds its word for its own number of samples
+        return np.repeat(words.reshape(len(groups), -1), galvo.pixel_map.ravel(), axis=1)
+
+    # every pixel holds its word for pixel_samples ticks of the sample clock
+    per_sample = np.broadcast_to(words[..., None], words.shape + (galvo.pixel_samples,))
+    frame_words = per_sample.reshape(len(groups), galvo.frame_samples)
+    if galvo.frames > 1:
+        # bursts repeat the same masks in every frame
+        return np.tile(frame_words, (1, galvo.frames))
+    return frame_words
+
+
+def check_alignment(galvo, do_chans, mod_masks, words, line_phase=0):
+    # reduces one frame of each line's ttl like acquired data, the on pixels have to come back as the mask
+    # on forward and backward rows alike, otherwise the modulation lands next to the pixels it was drawn on
+    for p, lines in enumerate(port_groups(do_chans).values()):
+        for idx, line in lines:
+            ttl = ((words[p:p + 1, :galvo.frame_samples] >> np.uint32(line)) & 1).astype(np.float32)
+            on = reduce_pixels(ttl, galvo, line_phase, threads=False)[0] > 0.5
+            if not np.array_equal(on, np.asarray(mod_masks[idx]) > 0):
+                raise ValueError(f"Compiled modulation for {do_chans[idx]} does not line up with its mask.")
+
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
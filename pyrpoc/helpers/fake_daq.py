@@ -0,0 +1,293 @@
+import threading
+import time
+from types import SimpleNamespace
+import numpy as np
+
+# a simulated daq for ScanSession(backend=FakeDAQ()), it implements the part of nidaqmx that ScanSession uses:
+# Task (channels, timing, commit, start/stop/wait, every-n-samples events) and the multi channel stream
+# readers/writers. the pmt signal is a phantom image sampled along the galvo waveform that was written to ao
+
+
+def default_phantom(size=512, channels=3, seed=0):
+    # gaussian "cells" on a faint ring, a different random layout per channel
+    yy, xx = np.mgrid[0:size, 0:size] / size
+    rng = np.random.default_rng(seed)
+    planes = []
+    for _ in range(channels):
+        plane = np.zeros((size, size))
+        for cx, cy, r, amp in rng.random((40, 4)):
+            r = 0.01 + 0.04 * r
+            plane += amp * np.exp(-((xx - cx) ** 2 + (yy - cy) ** 2) / (2 * r * r))
+        radius = (xx - 0.5) ** 2 + (yy - 0.5) ** 2
+        plane += 0.3 * ((radius < 0.16) & (radius > 0.12))
+        planes.append(plane)
+    return np.stack(planes)
+
+
+class FakeDAQ:
+    def __init__(self, phantom=None, realtime=True, noise=0.02, offset=0.0, line_lag=0, modulation_depth=0.0, fov=None, seed=0, ai_range=10.0):
+        # phantom: (channels, h, w) or (h, w), ai channel k sees plane k % channels
+        # realtime: sleep for the real frame time, otherwise a virtual clock makes every sample available at once
+        # line_lag: samples the signal trails the ao waveform by, like a real galvo, for bidirectional testing
+        # modulation_depth: fraction of signal removed while any do line is high, so masks show up in the image
+        # fov: +-volts mapped onto the phantom, None maps the extent of the written waveform
+        # ai_range: +-volts of the simulated 16 bit converter behind unscaled reads
+        phantom = default_phantom() if phantom is None else np.asarray(phantom, dtype=np.float64)
+        self.phantom = phantom[None] if phantom.ndim == 2 else phantom
+        self.realtime = realtime
+        self.noise = noise
+        self.offset = offset
+        self.line_lag = int(line_lag)
+        self.modulation_depth = modulation_depth
+        self.fov = fov
+        self.scaling_coeff = [0.0, ai_range / 32768.0]
+        self.rng = np.random.default_rng(seed)
+
+        self.clock = threading.Condition()
+        self.clock_start = None  # perf_counter of the ao start, None while stopped
+        self.clock_rate = None
+        self.clock_samples = 0
+
+        self.ao_waveform = None
+        self.extent = None
+        self.do_words = None
+        self.do_running = False
+        self.ao_writes = 0
+        self.do_writes = []  # every do buffer written, in order, for checking mask compilation
+        self.frames_started = 0
+        self.virtual_time = 0.0  # seconds of scanning on the simulated sample clock
+
+    # nidaqmx-shaped entry points, named like the classes they stand in for
+    def Task(self):
+        return FakeTask(self)
+
+    def AnalogMultiChannelReader(self, in_stream):
+        return FakeReader(in_stream.task)
+
+    def AnalogUnscaledReader(self, in_stream):
+        return FakeUnscaledReader(in_stream.task)
+
+    def AnalogMultiChannelWriter(self, out_stream, auto_start=False):
+        return FakeAnalogWriter(out_stream.task)
+
+    def DigitalMultiChannelWriter(self, out_stream, auto_start=False):
+        return FakeDigitalWriter(out_stream.task)
+
+    def start_clock(self, rate, samples):
+        with self.clock:
+            self.clock_start = time.perf_counter()
+            self.clock_rate = rate
+            self.clock_samples = samples
+            self.frames_started += 1
+            self.virtual_time += samples / rate
+            self.clock.notify_all()
+
+    def stop_clock(self):
+        with self.clock:
+            self.clock_start = None
+            self.clock.notify_all()
+
+    def available(self):
+        if self.clock_start is None:
+            return 0
+        if not self.realtime:
+            return self.clock_samples
+        return min(self.clock_samples, int((time.perf_counter() - self.clock_start) * self.clock_rate))
+
+    def wait_samples(self, needed, timeout=None, cancelled=None):
+        # blocks until the sample clock has produced `needed` samples, False on timeout or cancel
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        with self.clock:
+            while self.available() < needed:
+                if cancelled is not None and cancelled():
+                    return False
+                remaining = None if deadline is None else deadline - time.perf_counter()
+                if remaining is not None and remaining <= 0:
+                    return False
+                if self.clock_start is not None and self.realtime:
+                    step = (needed - self.available()) / self.clock_rate
+                else:
+                    step = 0.01
+                self.clock.wait(min(max(step, 1e-4), 0.01 if remaining is None else remaining))
+        return True
+
+    def write_ao(self, data):
+        self.ao_waveform = np.array(data, dtype=np.float64)
+        self.ao_writes += 1
+        if self.fov is not None:
+            self.extent = (-self.fov, self.fov, -self.fov, self.fov)
+        else:
+            x, y = self.ao_waveform[0], self.ao_waveform[-1]
+            self.extent = (x.min(), x.max(), y.min(), y.max())
+
+    def write_do(self, words):
+        self.do_words = words
+        self.do_writes.append(words)
+
+    def signal(self, start, count, n_channels):
+        # (n_channels, count) pmt samples for sample indices start..start+count of the running task
+        idx = np.clip(np.arange(start, start + count) - self.line_lag, 0, self.ao_waveform.shape[1] - 1)
+        x = self.ao_waveform[0, idx]
+        y = self.ao_waveform[-1, idx]
+        x0, x1, y0, y1 = self.extent
+        _, h, w = self.phantom.shape
+        cols = np.clip(np.rint((x - x0) / max(x1 - x0, 1e-12) * (w - 1)), 0, w - 1).astype(np.intp)
+        rows = np.clip(np.rint((y1 - y) / max(y1 - y0, 1e-12) * (h - 1)), 0, h - 1).astype(np.intp)
+
+        gain = 1.0
+        if self.modulation_depth and self.do_running and self.do_words is not None:
+            do_idx = np.clip(np.arange(start, start + count), 0, self.do_words.shape[1] - 1)
+            gain = 1.0 - self.modulation_depth * (self.do_words[:, do_idx] != 0).any(axis=0)
+
+        out = np.empty((n_channels, count))
+        for ch in range(n_channels):
+            out[ch] = self.phantom[ch % len(self.phantom)][rows, cols] * gain
+        if self.noise:
+            out += self.noise * self.rng.standard_normal(out.shape)
+        return out + self.offset
+
+
+class FakeChannels:
+    def __init__(self, task, kind):
+        self.task = task
+        self.kind = kind
+
+    def add(self, name):
+        self.task.kind = self.kind
+        self.task.channel_names.append(name)
+
+    def __getitem__(self, index):
+        name = self.task.channel_names[index]
+        return SimpleNamespace(name=name, ai_dev_scaling_coeff=list(self.task.daq.scaling_coeff), ai_raw_samp_size=16)
+
+    def add_ao_voltage_chan(self, physical_channel, *args, **kwargs):
+        self.add(physical_channel)
+
+    def add_ai_voltage_chan(self, physical_channel, *args, **kwargs):
+        self.add(physical_channel)
+
+    def add_do_chan(self, lines, *args, **kwargs):
+        self.add(lines)
+
+
+class FakeTiming:
+    def __init__(self, task):
+        self.task = task
+
+    def cfg_samp_clk_timing(self, rate, source=None, sample_mode=None, samps_per_chan=1000, **kwargs):
+        self.task.rate = rate
+        self.task.samples = samps_per_chan
+        self.task.source = source
+
+
+class FakeTask:
+    def __init__(self, daq):
+        self.daq = daq
+        self.kind = None
+        self.channel_names = []
+        self.rate = None
+        self.samples = 0
+        self.source = None
+        self.running = False
+        self.read_pos = 0
+        self.every_n = None
+        self.event_thread = None
+
+        self.ao_channels = FakeChannels(self, 'ao')
+        self.ai_channels = FakeChannels(self, 'ai')
+        self.do_channels = FakeChannels(self, 'do')
+        self.timing = FakeTiming(self)
+        self.in_stream = SimpleNamespace(task=self)
+        self.out_stream = SimpleNamespace(task=self)
+
+    def control(self, action):
+        pass  # nothing to reserve or commit
+
+    def register_every_n_samples_acquired_into_buffer_event(self, sample_interval, callback_method):
+        self.every_n = (sample_interval, callback_method) if callback_method is not None else None
+
+    def start(self):
+        self.running = True
+        self.read_pos = 0
+        if self.kind == 'ao':
+            # the ao sample clock drives ai and do, like /DevN/ao/SampleClock on the real card
+            self.daq.start_clock(self.rate, self.samples)
+        elif self.kind == 'do':
+            self.daq.do_running = True
+        elif self.kind == 'ai' and self.every_n is not None:
+            self.event_thread = threading.Thread(target=self.fire_events, name='fake_daq_events', daemon=True)
+            self.event_thread.start()
+
+    def fire_events(self):
+        interval, callback = self.every_n
+        acquired = interval
+        while acquired <= self.samples:
+            if not self.daq.wait_samples(acquired, cancelled=lambda: not self.running):
+                return
+            callback(0, 1, interval, None)
+            acquired += interval
+
+    def wait_until_done(self, timeout=10.0):
+        if not self.daq.wait_samples(self.samples, timeout=timeout):
+            raise TimeoutError(f"Simulated {self.kind} task did not finish within {timeout:.1f} s.")
+
+    def stop(self):
+        self.running = False
+        if self.kind == 'ao':
+            self.daq.stop_clock()
+        elif self.kind == 'do':
+            self.daq.do_running = False
+        if self.event_thread is not None and self.event_thread is not threading.current_thread():
+            self.event_thread.join(timeout=1)
+        self.event_thread = None
+
+    def close(self):
+        self.stop()
+
+
+class FakeReader:
+    def __init__(self, task):
+        self.task = task
+
+    def read_many_sample(self, data, number_of_samples_per_channel=None, timeout=10.0):
+        task = self.task
+        count = data.shape[1] if number_of_samples_per_channel is None else number_of_samples_per_channel
+        if not task.daq.wait_samples(task.read_pos + count, timeout=timeout):
+            raise TimeoutError(f"Simulated ai read of {count} samples timed out.")
+        data[:, :count] = task.daq.signal(task.read_pos, count, data.shape[0])
+        task.read_pos += count
+        return count
+
+
+class FakeUnscaledReader:
+    def __init__(self, task):
+        self.task = task
+
+    def read_int16(self, data, number_of_samples_per_channel=-1, timeout=10.0):
+        task = self.task
+        count = data.shape[1] if number_of_samples_per_channel in (None, -1) else number_of_samples_per_channel
+        if not task.daq.wait_samples(task.read_pos + count, timeout=timeout):
+            raise TimeoutError(f"Simulated ai read of {count} samples timed out.")
+        offset, lsb = task.daq.scaling_coeff
+        volts = task.daq.signal(task.read_pos, count, data.shape[0])
+        data[:, :count] = np.clip(np.rint((volts - offset) / lsb), -32768, 32767)
+        task.read_pos += count
+        return count
+
+
+class FakeAnalogWriter:
+    def __init__(self, task):
+        self.task = task
+
+    def write_many_sample(self, data, timeout=10.0):
+        self.task.daq.write_ao(data)
+        return data.shape[1]
+
+
+class FakeDigitalWriter:
+    def __init__(self, task):
+        self.task = task
+
+    def write_many_sample_port_uint32(self, data, timeout=10.0):
+        self.task.daq.write_do(data)
+        return data.shape[1]
@@ -0,0 +1,43 @@
+import threading
+
+DISPLAY_FPS = 30  # default ceiling for live views, faster frames are skipped for display only
+
+
+def poll_interval(max_fps):
+    # milliseconds between polls of a mailbox for a display refreshing at most max_fps times a second
+    return max(1, int(round(1000.0 / max_fps)))
+
+
+class FrameMailbox:
+    # single slot hand-off from acquisition threads to a gui loop that polls it at a fixed rate
+    # a new frame replaces one that hasn't been shown yet, so a slow display skips frames instead of
+    # queueing them up behind each other. anything that has to see every frame (saving, statistics)
+    # must happen before the put, never in the display callback
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.item = None
+        self.posted = 0
+        self.shown = 0
+        self.dropped = 0  # frames replaced before the display got to them
+
+    def put(self, item):
+        # safe from any thread, returns False if an unshown frame was replaced
+        with self.lock:
+            replaced = self.item is not None
+            self.item = item
+            self.posted += 1
+            if replaced:
+                self.dropped += 1
+        return not replaced
+
+    def take(self):
+        # the newest frame, or None if nothing arrived since the last take
+        with self.lock:
+            item, self.item = self.item, None
+            if item is not None:
+                self.shown += 1
+        return item
+
+    def stats(self):
+        with self.lock:
+            return {'posted': self.posted, 'shown': self.shown, 'dropped': self.dropped}
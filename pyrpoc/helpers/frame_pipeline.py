@@ -0,0 +1,142 @@
+import queue
+import threading
+import time
+
+_STOP = object()
+
+
+class FramePipeline:
+    # bounded hand-off between the daq thread (producer) and host-side frame work (consumers)
+    # policy 'block' stalls the producer when the consumers fall behind, nothing is lost (saved stacks)
+    # policy 'drop' replaces the oldest queued frame instead, so the scanner never waits (continuous display)
+    def __init__(self, consumer, depth=2, policy='block', workers=1, name='frame_pipeline'):
+        if policy not in ('block', 'drop'):
+            raise ValueError(f"Unknown pipeline policy '{policy}', expected 'block' or 'drop'.")
+        self.consumer = consumer
+        self.policy = policy
+        self.queue = queue.Queue(maxsize=max(1, int(depth)))
+        self.lock = threading.Lock()
+
+        self.produced = 0
+        self.processed = 0
+        self.dropped = 0
+        self.blocked_time = 0.0  # seconds the producer spent waiting on back-pressure
+        self.max_depth = 0
+        self.error = None
+        self.closed = False
+
+        self.threads = [
+            threading.Thread(target=self._run, name=f'{name}_{i}', daemon=True)
+            for i in range(max(1, int(workers)))
+        ]
+        for t in self.threads:
+            t.start()
+
+    def put(self, item):
+        # returns False if a frame had to be dropped to make room, raises if a consumer has failed
+        self.raise_error()
+        if self.closed:
+            raise RuntimeError('Frame pipeline is already closed.')
+        with self.lock:
+            self.produced += 1
+
+        if self.policy == 'block':
+            start = time.perf_counter()
+            while True:
+                try:
+                    self.queue.put(item, timeout=0.1)
+                    break
+                except queue.Full:
+                    self.raise_error()  # don't wait forever on consumers that died
+            with self.lock:
+                self.blocked_time += time.perf_counter() - start
+                self.max_depth = max(self.max_depth, self.queue.qsize())
+            return True
+
+        kept = True
+        while True:
+            try:
+                self.queue.put_nowait(item)
+                break
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.queue.task_done()
+                    kept = False
+                    with self.lock:
+                        self.dropped += 1
+                except queue.Empty:
+                    pass  # a consumer just took it, try again
+        with self.lock:
+            self.max_depth = max(self.max_depth, self.queue.qsize())
+        return kept
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is _STOP:
+                self.queue.task_done()
+                return
+            try:
+                if self.error is None:
+                    self.consumer(item)
+                    with self.lock:
+                        self.processed += 1
+            except Exception as e:
+                print(f"[ERROR] Frame pipeline consumer failed: {e}")
+                with self.lock:
+                    if self.error is None:
+                        self.error = e
+            finally:
+                self.queue.task_done()
+
+    def raise_error(self):
+        if self.error is not None:
+            raise self.error
+
+    def drain(self):
+        # wait until every frame handed over so far has been consumed, without shutting down
+        self.queue.join()
+        self.raise_error()
+
+    def close(self, discard=False):
+        # waits for every queued frame unless discard, then re-raises the first consumer error
+        if self.closed:
+            self.raise_error()
+            return
+        self.closed = True
+        if discard:
+            while True:
+                try:
+                    self.queue.get_nowait()
+                    self.queue.task_done()
+                    with self.lock:
+                        self.dropped += 1
+                except queue.Empty:
+                    break
+        for _ in self.threads:
+            self.queue.put(_STOP)
+        for t in self.threads:
+            t.join()
+        self.raise_error()
+
+    def stats(self):
+        with self.lock:
+            return {
+                'produced': self.produced,
+                'processed': self.processed,
+                'dropped': self.dropped,
+                'blocked_time': self.blocked_time,
+                'max_depth': self.max_depth,
+            }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.close(discard=exc_type is not None)
+        except Exception:
+            if exc_type is None:
+                raise  # otherwise keep the original exception
+        return False
@@ -1,21 +1,44 @@
 import numpy as np
+from pyrpoc.helpers.do_compiler import mask_digest
+
+GALVO_DEFAULTS = {
+    "numsteps_x": 400,
+    "numsteps_y": 400,
+    "extrasteps_left": 50,
+    "extrasteps_right": 50,
+    "offset_x": 0.0,
+    "offset_y": 0.0,
+    "dwell": 10e-6,
+    "amp_x": 0.5,
+    "amp_y": 0.5,
+    "rate": 100000,
+    "device": 'Dev1',
+    "ao_chans": ['ao1', 'ao0'],
+    "bidirectional": False,
+    "settle_samples": 0
+}
+
+def pixel_samples_for(dwell, rate):
+    # samples per pixel, the dwell is truncated to whole sample clock ticks and never drops below one
+    return max(1, int(dwell * rate))
+
+def preview_config(config, factor):
+    # the same field of view on a grid `factor` times coarser per axis, for quick frames while aligning
+    # the dwell grows by the same factor, so lines take as long and the galvos move exactly as in the full scan,
+    # the frame is `factor` times faster from the fewer lines (and every pixel averages more samples)
+    cfg = dict(GALVO_DEFAULTS)
+    cfg.update(config)
+    for key in ('numsteps_x', 'numsteps_y'):
+        cfg[key] = max(1, int(cfg[key]) // factor)
+    for key in ('extrasteps_left', 'extrasteps_right'):
+        steps = int(cfg[key])
+        cfg[key] = max(1, round(steps / factor)) if steps else 0  # same turnaround time at the longer dwell
+    cfg['dwell'] = cfg['dwell'] * factor
+    return cfg
 
 class Galvo:
-    def __init__(self, config, rpoc_mask=None, rpoc_do_chan=None, rpoc_mode=None, dwell_multiplier=2.0, **kwargs):
-        defaults = {
-            "numsteps_x": 400,
-            "numsteps_y": 400,
-            "extrasteps_left": 50,
-            "extrasteps_right": 50,
-            "offset_x": 0.0,
-            "offset_y": 0.0,
-            "dwell": 10e-6,
-            "amp_x": 0.5,
-            "amp_y": 0.5,
-            "rate": 100000,
-            "device": 'Dev1',
-            "ao_chans": ['ao1', 'ao0']
-        }
+    def __init__(self, config, rpoc_mask=None, rpoc_do_chan=None, rpoc_mode=None, dwell_multiplier=2.0, frames=1, **kwargs):
+        defaults = dict(GALVO_DEFAULTS)
         if config:
             defaults.update(config)
         defaults.update(kwargs)
@@ -27,16 +50,41 @@ class Galvo:
         self.rpoc_mode = rpoc_mode  # "standard" or "variable" so far
         self.dwell_multiplier = dwell_multiplier
 
-        self.pixel_samples = max(1, int(self.dwell * self.rate))
+        self.pixel_samples = pixel_samples_for(self.dwell, self.rate)
         self.total_x = self.numsteps_x + self.extrasteps_left + self.extrasteps_right
         self.total_y = self.numsteps_y
         self.total_samples = self.total_x * self.total_y * self.pixel_samples
+        self.pixel_map = None
+        self.mask_key = None
+        self.frames = max(1, int(frames))  # bursts scan the same raster this many times back to back
 
         if self.rpoc_mode == "variable":
-            self.waveform = None  # or maybe generate it here...
+            self.bidirectional = False  # variable dwell rows are always scanned left to right
+            self.frames = 1  # frames of different length can't be split on a fixed sample count
+            if rpoc_mask is None:
+                self.waveform = None
+            else:
+                x_wave, y_wave, self.pixel_map = self.gen_variable_waveform(rpoc_mask, dwell_multiplier)
+                self.waveform = np.vstack([x_wave, y_wave])
+                self.total_samples = self.waveform.shape[1]
+                self.mask_key = mask_digest(rpoc_mask)
         else:
             self.waveform = self.gen_raster()
 
+        self.frame_samples = self.total_samples
+        if self.frames > 1 and self.waveform is not None:
+            self.waveform = np.tile(self.waveform, (1, self.frames))
+            self.total_samples = self.frame_samples * self.frames
+
+    def scan_key(self):
+        # everything that determines the samples written to the daq, used to skip rewriting unchanged buffers
+        return (
+            self.device, tuple(self.ao_chans), self.rate, self.pixel_samples,
+            self.numsteps_x, self.numsteps_y, self.extrasteps_left, self.extrasteps_right,
+            self.offset_x, self.offset_y, self.amp_x, self.amp_y, self.rpoc_mode, bool(self.bidirectional),
+            self.dwell_multiplier if self.pixel_map is not None else None, self.mask_key, self.frames
+        )
+
     def gen_raster(self):
         contained_rowsamples = self.pixel_samples * self.numsteps_x
         total_rowsamples = self.pixel_samples * self.total_x
@@ -48,6 +96,9 @@ class Galvo:
 
         single_row_ramp = np.linspace(bottom, top, total_rowsamples, endpoint=False)
         x_waveform = np.tile(single_row_ramp, self.total_y)
+        if self.bidirectional:
+            # odd rows run back along the same ramp instead of flying back, run_scan flips them again
+            x_waveform.reshape(self.total_y, total_rowsamples)[1::2] = single_row_ramp[::-1]
 
         y_steps = np.linspace(
             self.offset_y + self.amp_y,
@@ -77,44 +128,27 @@ class Galvo:
         num_y = self.numsteps_y
         num_x = self.numsteps_x + self.extrasteps_left + self.extrasteps_right
 
-        mask_shape = np.shape(mask)
-        if mask_shape[1] != num_y or mask_shape[0] != (num_x - self.extrasteps_left - self.extrasteps_right):
-            raise ValueError(f'Error in galvo_funcs.gen_variable_waveform(). Mask is not the right size. Load a mask of dimensions {num_x - self.extrasteps_left - self.extrasteps_right} by {num_y}.')
-
+        mask = np.asarray(mask) > 0
+        if mask.shape != (num_y, self.numsteps_x):
+            raise ValueError(f'Error in galvo_funcs.gen_variable_waveform(). Mask is not the right size. Load a mask of dimensions {self.numsteps_x} by {num_y}.')
 
-        dwell_on = dwell * dwell_multiplier
-        dwell_off = dwell
+        samps_on = max(1, int(dwell * dwell_multiplier * rate))
+        samps_off = max(1, int(dwell * rate))
 
+        # extrasteps always get the normal dwell, only masked pixels inside the image get the long one
+        pixel_map = np.full((num_y, num_x), samps_off, dtype=np.int64)
+        pixel_map[:, self.extrasteps_left:self.extrasteps_left + self.numsteps_x][mask] = samps_on
 
-        x_min = self.offset_x - self.amp_x
-        x_max = self.offset_x + self.amp_x
-        x_positions = np.linspace(x_min, x_max, num_x, endpoint=False)
+        # same pixel grid as gen_raster, but each pixel holds its starting position for its own number of samples
+        step_size = (2 * self.amp_x) / (samps_off * self.numsteps_x)
+        bottom = self.offset_x - self.amp_x - (step_size * self.extrasteps_left)
+        top = self.offset_x + self.amp_x + (step_size * self.extrasteps_right)
+        x_positions = np.linspace(bottom, top, num_x, endpoint=False)
         y_positions = np.linspace(self.offset_y + self.amp_y,
                                 self.offset_y - self.amp_y,
                                 num_y)
 
-        x_wave_list = []
-        y_wave_list = []
-        pixel_map = np.zeros((num_y, num_x), dtype=int)
-
-        for row_idx in range(num_y):
-            row_y = y_positions[row_idx]
-            for col_idx in range(num_x):
-                if col_idx < self.extrasteps_left or col_idx >= (num_x - self.extrasteps_right): # for clarity im leaving this out of the else - we need to remember to account for extrasteps here
-                    this_dwell = dwell_off
-                elif mask[row_idx, col_idx - self.extrasteps_left]:
-                    this_dwell = dwell_on
-                else:
-                    this_dwell = dwell_off
-
-                pixel_samps = max(1, int(this_dwell * rate))
-
-                x_val = x_positions[col_idx]
-                x_wave_list.append(np.full(pixel_samps, x_val))
-
-                y_wave_list.append(np.full(pixel_samps, row_y))
-
-                pixel_map[row_idx, col_idx] = pixel_samps
-        x_wave = np.concatenate(x_wave_list)
-        y_wave = np.concatenate(y_wave_list)
+        counts = pixel_map.ravel()
+        x_wave = np.repeat(np.tile(x_positions, num_y), counts)
+        y_wave = np.repeat(np.repeat(y_positions, num_x), counts)
         return x_wave, y_wave, pixel_map
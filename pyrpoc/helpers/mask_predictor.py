@@ -0,0 +1,135 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from pyrpoc.helpers.utils import to_uint8
+from pyrpoc.helpers.mask_workers import MaskScript
+
+
+class MaskScriptError(Exception):
+    def __init__(self, index, error):
+        super().__init__(str(error))
+        self.index = index  # modulation channel whose script failed
+        self.error = error
+
+
+def run_mask_scripts(scripts, data_list, budget=None):
+    # scripts is {mod channel index: generate_mask}, every script sees the same uint8 (channels, y, x) stack
+    # MaskScript workers get the per-call budget, plain callables run in-process
+    converted = np.stack([to_uint8(d) for d in data_list])
+    masks = {}
+    for i, func in scripts.items():
+        try:
+            mask_array = np.asarray(func(converted, budget) if isinstance(func, MaskScript) else func(converted))
+            if mask_array.shape != converted[0].shape:
+                raise ValueError(f"Returned mask is the wrong size relative to input imgae shape. Input shape: {converted[0].shape}, mask shape: {mask_array.shape}")
+        except Exception as e:
+            raise MaskScriptError(i, e) from e
+        masks[i] = mask_array > 0
+    return masks
+
+
+class MaskPredictor:
+    # predictive closed-loop rpoc: the masks for frame N come from frame N-1, computed in the background
+    # while frame N is already scanning, so the steady state costs one scan per frame instead of two
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='mask_predictor')
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        # results of predictions still in flight from before the reset are thrown away
+        with self.lock:
+            self.generation = getattr(self, 'generation', 0) + 1
+            self.frame = -1  # index of the frame currently being scanned
+            self.masks = None
+            self.source = None  # frame the current masks were computed from
+            self.key = None  # (scripts, image shape) the masks belong to
+            self.last_refresh = None
+            self.pending = None
+            self.error = None
+            self.predicted = 0  # frames scanned with a predicted mask
+            self.refreshed = 0  # frames that needed the extra unmodulated scan
+
+    def begin_frame(self):
+        with self.lock:
+            self.frame += 1
+            return self.frame
+
+    def next_masks(self, scripts, shape, max_stale, refresh_every=0):
+        # masks for the current frame if they are at most max_stale frames old, otherwise None, which means
+        # the caller has to do a refresh double scan and hand the result to store()
+        key = self.mask_key(scripts, shape)
+        with self.lock:
+            if self.error is not None:
+                error, self.error = self.error, None
+                raise error
+            if key != self.key:
+                return None
+            if refresh_every and (self.last_refresh is None or self.frame - self.last_refresh >= refresh_every):
+                return None
+            masks = self.usable(max_stale)
+            pending = self.pending
+
+        if masks is None and pending is not None:
+            # too stale, but the newer prediction might only be moments away
+            try:
+                pending.result()
+            except Exception:
+                pass
+            with self.lock:
+                if self.error is not None:
+                    error, self.error = self.error, None
+                    raise error
+                masks = self.usable(max_stale)
+
+        if masks is not None:
+            with self.lock:
+                self.predicted += 1
+        return masks
+
+    def usable(self, max_stale):
+        if self.masks is None or self.frame - self.source > max_stale:
+            return None
+        return self.masks
+
+    def store(self, scripts, shape, masks):
+        # masks computed synchronously from the current frame, i.e. a refresh
+        with self.lock:
+            self.masks = masks
+            self.source = self.frame
+            self.key = self.mask_key(scripts, shape)
+            self.last_refresh = self.frame
+            self.refreshed += 1
+
+    def submit(self, scripts, shape, data_list, budget=None):
+        # predict the next frame's masks from this frame, data_list has to stay untouched by the caller
+        with self.lock:
+            generation = self.generation
+            source = self.frame
+        key = self.mask_key(scripts, shape)
+
+        def predict():
+            try:
+                masks = run_mask_scripts(scripts, data_list, budget)
+            except Exception as e:
+                with self.lock:
+                    if generation == self.generation:
+                        self.error = e
+                return
+            with self.lock:
+                if generation == self.generation and (self.source is None or source > self.source or key != self.key):
+                    self.masks = masks
+                    self.source = source
+                    self.key = key
+
+        future = self.executor.submit(predict)
+        with self.lock:
+            self.pending = future
+        return future
+
+    def mask_key(self, scripts, shape):
+        # reloading a script or resizing the image invalidates every prediction made with the old one
+        return (tuple((i, id(func)) for i, func in sorted(scripts.items())), tuple(shape))
+
+    def close(self):
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,235 @@
+import importlib.util
+import multiprocessing as mp
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from multiprocessing import shared_memory
+import numpy as np
+
+# kept free of gui/daq imports on purpose, spawned workers import this module and nothing else of pyrpoc
+
+DEFAULT_BUDGET = 0.2  # seconds a mask call may take before the last good mask is used instead
+FIRST_CALL_TIMEOUT = 30.0  # without a good mask to fall back on, cold scripts (model loading etc.) get this long
+# a call is only taken for hung, and its worker restarted, once it has run for HANG_TIMEOUT seconds and
+# HANG_FACTOR times as long as the slowest recent call, so scripts that are slow on every call (e.g. a
+# cellpose model) keep their warm worker and just hand out the last good mask in between
+HANG_FACTOR = 10
+HANG_TIMEOUT = 120.0
+STARTUP_TIMEOUT = 60.0
+
+
+def _load_generate_mask(path):
+    script_dir = os.path.dirname(os.path.abspath(path))
+    if script_dir not in sys.path:
+        sys.path.insert(0, script_dir)  # so scripts can import their neighbours
+    spec = importlib.util.spec_from_file_location("user_mask", path)
+    user_mask = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(user_mask)
+    if not hasattr(user_mask, 'generate_mask'):
+        raise ImportError("No function `generate_mask(image_data)` found.")
+    return user_mask.generate_mask
+
+
+def _worker_main(path, conn):
+    # imports the script once and then serves frames from shared memory until told to stop
+    try:
+        generate_mask = _load_generate_mask(path)
+    except Exception as e:
+        conn.send(('error', f"{type(e).__name__}: {e}"))
+        return
+    conn.send(('ready', None))
+
+    while True:
+        try:
+            msg = conn.recv()
+        except EOFError:
+            return
+        if msg is None:
+            return
+        shm_name, shape, dtype = msg
+        shm = shared_memory.SharedMemory(name=shm_name)
+        try:
+            image = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+            start = time.perf_counter()
+            mask = np.asarray(generate_mask(image))
+            elapsed = time.perf_counter() - start
+            if mask.shape != tuple(shape[1:]):
+                raise ValueError(f"Returned mask is the wrong size relative to input imgae shape. Input shape: {tuple(shape[1:])}, mask shape: {mask.shape}")
+            conn.send(('ok', (mask > 0, elapsed)))
+        except Exception as e:
+            conn.send(('error', f"{type(e).__name__}: {e}\n{traceback.format_exc(limit=3)}"))
+        finally:
+            image = None
+            shm.close()
+
+
+class MaskScript:
+    # a user generate_mask script running in its own warm worker process
+    # frames go in through shared memory, every call gets a time budget, and a slow or failing call
+    # falls back to the last good mask instead of blocking or aborting the scan
+    def __init__(self, path):
+        self.path = path
+        self.name = os.path.basename(path)
+        self.ctx = mp.get_context('spawn')  # never fork a process that owns tk and daq threads
+        self.process = None
+        self.conn = None
+        self.ready = False
+        self.shm = None
+        self.pending = None  # start time of a call whose answer hasn't been collected yet
+        self.last_good = None
+        self.lock = threading.Lock()  # the acquisition and prediction threads may both call in
+
+        self.calls = 0
+        self.timeouts = 0  # calls that missed their deadline
+        self.fallbacks = 0  # frames that got the last good mask instead of a fresh one
+        self.errors = 0
+        self.restarts = 0
+        self.latencies = deque(maxlen=100)  # seconds spent inside generate_mask, as timed by the worker
+
+        self.start()
+        # fail at load time like the in-process loader did, e.g. for a missing generate_mask
+        if not self.conn.poll(STARTUP_TIMEOUT):
+            self.close()
+            raise TimeoutError(f"{self.name} did not finish importing within {STARTUP_TIMEOUT:.0f} s.")
+        self.receive_ready()
+
+    def start(self):
+        self.conn, child_conn = self.ctx.Pipe()
+        self.process = self.ctx.Process(target=_worker_main, args=(self.path, child_conn), daemon=True, name=f'mask_{self.name}')
+        self.process.start()
+        child_conn.close()
+        self.ready = False
+        self.pending = None
+
+    def receive_ready(self):
+        status, payload = self.conn.recv()
+        if status != 'ready':
+            self.close()
+            raise ImportError(payload)
+        self.ready = True
+
+    def hang_limit(self, budget):
+        slowest = max(self.latencies) if self.latencies else 0.0
+        return max(HANG_TIMEOUT, HANG_FACTOR * max(budget, slowest))
+
+    def restart(self, running):
+        print(f"[WARNING] Restarting mask worker for {self.name}, its last call has not returned after {running:.0f} s.")
+        self.stop_process()
+        self.restarts += 1
+        self.start()
+
+    def __call__(self, image, budget=None):
+        # image is the (channels, y, x) uint8 stack, returns a boolean (y, x) mask
+        with self.lock:
+            return self.call(image, DEFAULT_BUDGET if budget is None else budget)
+
+    def call(self, image, budget):
+        image = np.ascontiguousarray(image)
+        fallback = self.fallback(image.shape[1:])
+
+        if not self.ready:
+            # restarted worker still importing the script
+            if not self.conn.poll(0 if fallback is not None else STARTUP_TIMEOUT):
+                return self.use_fallback(fallback, 'still starting')
+            self.receive_ready()
+
+        if self.pending is not None:
+            # a previous call overran its budget, collect it if it has finished since
+            if self.conn.poll(0):
+                self.collect()
+            elif time.perf_counter() - self.pending > self.hang_limit(budget):
+                self.restart(time.perf_counter() - self.pending)
+                return self.use_fallback(fallback, 'restarted')
+            else:
+                return self.use_fallback(fallback, 'busy')
+            fallback = self.fallback(image.shape[1:])
+
+        self.write_frame(image)
+        self.calls += 1
+        self.conn.send((self.shm.name, image.shape, image.dtype.str))
+        self.pending = time.perf_counter()
+        if not self.conn.poll(budget if fallback is not None else max(budget, FIRST_CALL_TIMEOUT)):
+            self.timeouts += 1
+            return self.use_fallback(fallback, f'over its {budget * 1e3:.0f} ms budget')
+
+        error = self.collect()
+        if error is not None:
+            if fallback is None:
+                raise RuntimeError(error)
+            print(f"[WARNING] Mask script {self.name} failed, reusing its last good mask: {error}")
+            self.fallbacks += 1
+            return fallback
+        return self.last_good
+
+    def collect(self):
+        # returns the error text if the worker reported one
+        status, payload = self.conn.recv()
+        self.pending = None
+        if status == 'ok':
+            self.last_good, elapsed = payload
+            self.latencies.append(elapsed)
+            return None
+        self.errors += 1
+        return payload
+
+    def write_frame(self, image):
+        # one shared block per worker, only reallocated when the frame size changes
+        if self.shm is None or self.shm.size < image.nbytes:
+            self.release_shm()
+            self.shm = shared_memory.SharedMemory(create=True, size=max(1, image.nbytes))
+        np.ndarray(image.shape, dtype=image.dtype, buffer=self.shm.buf)[...] = image
+
+    def fallback(self, shape):
+        if self.last_good is not None and self.last_good.shape == tuple(shape):
+            return self.last_good
+        return None
+
+    def use_fallback(self, fallback, reason):
+        if fallback is None:
+            raise TimeoutError(f"Mask script {self.name} is {reason} and there is no previous mask to fall back on.")
+        self.fallbacks += 1
+        return fallback
+
+    def stats(self):
+        lat = np.asarray(self.latencies) * 1e3
+        return {
+            'calls': self.calls,
+            'timeouts': self.timeouts,
+            'fallbacks': self.fallbacks,
+            'errors': self.errors,
+            'restarts': self.restarts,
+            'last_ms': float(lat[-1]) if lat.size else None,
+            'mean_ms': float(lat.mean()) if lat.size else None,
+            'p95_ms': float(np.percentile(lat, 95)) if lat.size else None,
+        }
+
+    def stop_process(self):
+        if self.process is None:
+            return
+        try:
+            if self.pending is None and self.process.is_alive():
+                self.conn.send(None)
+                self.process.join(timeout=1)
+        except (OSError, EOFError, BrokenPipeError):
+            pass
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(timeout=1)
+        self.conn.close()
+        self.process = None
+        self.release_shm()
+
+    def release_shm(self):
+        if self.shm is not None:
+            self.shm.close()
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+            self.shm = None
+
+    def close(self):
+        self.stop_process()
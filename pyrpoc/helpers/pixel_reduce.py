@@ -0,0 +1,131 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+# frames with at least this many raw samples get split across threads, numpy reductions release the gil
+PARALLEL_MIN_SAMPLES = 1 << 22
+REDUCE_WORKERS = min(8, os.cpu_count() or 1)
+# frames whose float64 raw buffer would be bigger than this are read as unscaled integers a chunk of rows
+# at a time instead, and CHUNK_BYTES bounds the raw samples held per chunk
+CHUNKED_FRAME_BYTES = 256 << 20
+CHUNK_BYTES = 16 << 20
+_executor = None
+
+
+def _pool():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=REDUCE_WORKERS, thread_name_prefix='pixel_reduce')
+    return _executor
+
+
+def settle_samples(galvo):
+    # always keep at least one sample per pixel
+    return max(0, min(int(getattr(galvo, 'settle_samples', 0) or 0), galvo.pixel_samples - 1))
+
+
+def reduce_pixels(raw, galvo, line_phase=0, row_start=0, out=None, threads=True):
+    # raw (channels, whole rows of samples) -> (channels, rows, numsteps_x) float32 pixel means
+    # only the kept columns are touched, the first settle_samples of every pixel are skipped, and
+    # row_start is the frame row of raw's first row so bidirectional parity survives row blocks
+    row_samples = galvo.total_x * galvo.pixel_samples
+    n_channels = raw.shape[0]
+    nrows = raw.shape[1] // row_samples
+    if out is None:
+        out = np.empty((n_channels, nrows, galvo.numsteps_x), dtype=np.float32)
+
+    workers = REDUCE_WORKERS if threads else 1
+    if workers > 1 and raw.shape[0] * nrows * row_samples >= PARALLEL_MIN_SAMPLES and nrows >= 2 * workers:
+        bounds = np.linspace(0, nrows, workers + 1).astype(int)
+        futures = [
+            _pool().submit(_reduce_rows, raw[:, lo * row_samples:hi * row_samples], galvo, out[:, lo:hi], row_start + lo, line_phase)
+            for lo, hi in zip(bounds[:-1], bounds[1:]) if hi > lo
+        ]
+        for f in futures:
+            f.result()
+    else:
+        _reduce_rows(raw, galvo, out, row_start, line_phase)
+    return out
+
+
+def _reduce_rows(raw, galvo, out, row_start, line_phase):
+    row_samples = galvo.total_x * galvo.pixel_samples
+    nrows = out.shape[1]
+    settle = settle_samples(galvo)
+    view = raw[:, :nrows * row_samples].reshape(raw.shape[0], nrows, galvo.total_x, galvo.pixel_samples)[..., settle:]
+    left = galvo.extrasteps_left
+    nx = galvo.numsteps_x
+
+    if not galvo.bidirectional:
+        _mean_into(view[:, :, left:left + nx], out)
+        return
+
+    # backward rows were acquired right to left, their kept columns sit mirrored at the far end of the row
+    first_fwd = row_start % 2
+    first_bwd = 1 - first_fwd
+    _mean_into(view[:, first_fwd::2, left:left + nx], out[:, first_fwd::2])
+    lo = galvo.total_x - left - line_phase - nx
+    bwd = out[:, first_bwd::2]
+    _mean_into(view[:, first_bwd::2, lo:lo + nx], bwd)
+    bwd[...] = bwd[..., ::-1]
+
+
+def _mean_into(kept, out):
+    # sum in float64 and divide before the float32 cast, bit-identical to np.mean(...).astype(np.float32)
+    sums = np.add.reduce(kept, axis=-1, dtype=np.float64)
+    np.divide(sums, kept.shape[-1], out=out, casting='same_kind')
+
+
+def chunk_rows_for(galvo, n_channels, itemsize=2, chunk_bytes=CHUNK_BYTES):
+    rows = chunk_bytes // max(1, n_channels * galvo.total_x * galvo.pixel_samples * itemsize)
+    return max(1, min(int(rows), galvo.total_y))
+
+
+def scale_pixels(pixels, coeffs):
+    # raw -> volts polynomial of every channel applied in place to its (channels, y, x) pixel means
+    # the mean commutes with the offset and linear terms exactly, the higher device terms are negligible
+    for plane, c in zip(pixels, coeffs):
+        plane[...] = np.polynomial.polynomial.polyval(plane, c)
+    return pixels
+
+
+def max_line_phase(galvo):
+    # the shifted crop has to stay inside the extrasteps
+    return min(galvo.extrasteps_left, galvo.extrasteps_right)
+
+
+def phase_pixels(raw, galvo, max_pairs=32):
+    # full-width, channel-summed pixels of a few forward/backward row pairs, backward rows flipped
+    row_samples = galvo.total_x * galvo.pixel_samples
+    nrows = raw.shape[1] // row_samples
+    pairs = np.arange(0, nrows - 1, 2)
+    if len(pairs) > max_pairs:
+        pairs = pairs[np.linspace(0, len(pairs) - 1, max_pairs).astype(int)]
+    rows = np.stack([pairs, pairs + 1], axis=1).ravel()
+
+    settle = settle_samples(galvo)
+    view = raw[:, :nrows * row_samples].reshape(raw.shape[0], nrows, galvo.total_x, galvo.pixel_samples)
+    pixels = np.add.reduce(view[:, rows, :, settle:], axis=(0, 3), dtype=np.float64)
+    pixels[1::2] = pixels[1::2, ::-1]
+    return pixels
+
+
+def estimate_line_phase(pixels, max_shift):
+    # pixels is (rows, total_x) with backward rows already flipped, returns the shift s that best maps
+    # forward row columns c onto backward row columns c + s, from the summed circular cross-correlation
+    fwd = pixels[0:-1:2]
+    bwd = pixels[1::2][:len(fwd)]
+    if max_shift <= 0 or len(fwd) == 0:
+        return None
+    fwd = fwd - fwd.mean(axis=1, keepdims=True)
+    bwd = bwd - bwd.mean(axis=1, keepdims=True)
+    n = pixels.shape[1]
+    spectrum = (np.conj(np.fft.rfft(fwd, axis=1)) * np.fft.rfft(bwd, axis=1)).sum(axis=0)
+    xcorr = np.fft.irfft(spectrum, n)
+
+    shifts = np.arange(-max_shift, max_shift + 1)
+    lags = xcorr[shifts % n]
+    best = int(np.argmax(lags))
+    if lags[best] <= 0:
+        return None  # no usable structure in this frame, e.g. a dark or flat field
+    return int(shifts[best])
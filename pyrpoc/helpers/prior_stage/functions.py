@@ -188,7 +188,8 @@ def estimate_fov(gui, port: int, channel_name: str, step_um: int = 5, iterations
 
 
 
-def move_z(port: int, z_height: int):
+def move_z(port: int, z_height: int, wait: bool = True):
+    # wait=False only issues the move, call wait_for_motion() before relying on the position
     connect_prior(port)
 
     if not (0 <= z_height <= 50000):
@@ -197,7 +198,8 @@ def move_z(port: int, z_height: int):
     ret, _ = send_command(f"controller.z.goto-position {z_height}")
     if ret != 0:
         raise RuntimeError(f"Could not move Prior stage to {z_height} µm.")
-    wait_for_motion()
+    if wait:
+        wait_for_motion()
 
 
 def move_xy(port: int, x: int, y: int):
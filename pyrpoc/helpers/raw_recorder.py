@@ -0,0 +1,169 @@
+import json
+import os
+import numpy as np
+from pyrpoc.helpers.frame_pipeline import FramePipeline
+from pyrpoc.helpers.galvo_funcs import Galvo, GALVO_DEFAULTS
+
+# file layout: MAGIC, the json header zero padded to HEADER_BYTES, then frame after frame of unscaled ai samples
+# stored sample-major, i.e. (frames, frame_samples, channels) the way the daq interleaves them, so chunks of rows
+# append without reordering and the sample data starts page aligned for np.memmap
+MAGIC = b'PYRPOCRAW1\n'
+HEADER_BYTES = 64 * 1024
+RECORD_BUFFER_BYTES = 512 << 20  # raw chunks that may queue up behind a slow disk before the scan has to wait
+
+
+def galvo_header(galvo):
+    # enough to rebuild the scan geometry with Galvo(config) and reduce the samples again
+    config = {key: getattr(galvo, key) for key in GALVO_DEFAULTS}
+    config['ao_chans'] = list(config['ao_chans'])
+    config.update(pixel_samples=galvo.pixel_samples, total_x=galvo.total_x, total_y=galvo.total_y, frame_samples=galvo.frame_samples)
+    return config
+
+
+class RawRecorder:
+    # appends the unscaled samples of every scanned frame to path, the scan thread only copies each chunk,
+    # the file writes happen on a background thread
+    def __init__(self, path, buffer_bytes=RECORD_BUFFER_BYTES):
+        self.path = path
+        self.buffer_bytes = buffer_bytes
+        self.file = None
+        self.header = None
+        self.pipeline = None
+        self.frame_start = HEADER_BYTES  # file offset of the frame being written, for rolling back a failed one
+        self.frames = 0  # complete frames on disk
+
+    def begin_frame(self, galvo, channel_names, coeffs, dtype):
+        header = {
+            'version': 1,
+            'dtype': np.dtype(dtype).str,
+            'rate': float(galvo.rate),
+            'channels': list(channel_names),
+            'scaling_coeffs': [list(map(float, c)) for c in coeffs],
+            'galvo': galvo_header(galvo),
+        }
+        if self.header is None:
+            self.open(header, galvo, dtype)
+        elif header != self.header:
+            raise ValueError(f"Raw recording {os.path.basename(self.path)} was started with a different scan geometry or channels, start a new recording.")
+
+    def open(self, header, galvo, dtype):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.file = open(self.path, 'w+b')
+        self.header = header
+        self.write_header(frames=0)
+        self.file.seek(HEADER_BYTES)
+        chunk_bytes = len(header['channels']) * galvo.total_x * galvo.pixel_samples * np.dtype(dtype).itemsize
+        depth = max(4, self.buffer_bytes // max(1, chunk_bytes))
+        self.pipeline = FramePipeline(self.consume, depth=depth, policy='block', name='raw_recorder')
+
+    def write_header(self, frames):
+        # numpy scalars from the gui config are written as plain numbers
+        data = MAGIC + json.dumps(dict(self.header, frames=frames), default=lambda v: v.item()).encode()
+        if len(data) > HEADER_BYTES:
+            raise ValueError(f"Raw recording header is {len(data)} bytes, more than the {HEADER_BYTES} reserved for it.")
+        self.file.seek(0)
+        self.file.write(data.ljust(HEADER_BYTES, b'\0'))
+
+    def write(self, block):
+        # block is one chunk of whole rows, (channels, samples), and may be reused as soon as this returns
+        self.pipeline.put(('data', np.ascontiguousarray(block.T)))
+
+    def end_frame(self):
+        self.pipeline.put(('end', None))
+
+    def abort_frame(self):
+        # drops the samples of a frame that failed half way, so the file stays a whole number of frames
+        if self.pipeline is not None:
+            self.pipeline.put(('abort', None))
+
+    def consume(self, item):
+        kind, samples = item
+        if kind == 'data':
+            samples.tofile(self.file)
+        elif kind == 'end':
+            self.frames += 1
+            self.frame_start = self.file.tell()
+        else:
+            self.file.seek(self.frame_start)
+            self.file.truncate()
+
+    def stats(self):
+        stats = self.pipeline.stats() if self.pipeline is not None else {'blocked_time': 0.0, 'max_depth': 0}
+        return {'frames': self.frames, 'blocked_time': stats['blocked_time'], 'max_depth': stats['max_depth']}
+
+    def close(self):
+        if self.file is None:
+            return
+        try:
+            self.pipeline.close()
+        finally:
+            # a frame still open here never finished scanning
+            self.file.seek(self.frame_start)
+            self.file.truncate()
+            self.write_header(frames=self.frames)
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class RawRecording:
+    # lazy reader for a RawRecorder file, frames are memory-mapped views that are only read when touched
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            head = f.read(HEADER_BYTES)
+        if not head.startswith(MAGIC):
+            raise ValueError(f"{os.path.basename(path)} is not a raw recording.")
+        self.header = json.loads(head[len(MAGIC):].rstrip(b'\0'))
+        self.dtype = np.dtype(self.header['dtype'])
+        self.channels = self.header['channels']
+        self.rate = self.header['rate']
+        self.coeffs = [np.asarray(c, dtype=np.float64) for c in self.header['scaling_coeffs']]
+        self.frame_samples = self.header['galvo']['frame_samples']
+
+        # counted from the file size, so a recording that was never closed still opens
+        frame_bytes = self.frame_samples * len(self.channels) * self.dtype.itemsize
+        self.n_frames = (os.path.getsize(path) - HEADER_BYTES) // frame_bytes
+        self.data = None
+        if self.n_frames:
+            self.data = np.memmap(path, dtype=self.dtype, mode='r', offset=HEADER_BYTES,
+                                  shape=(self.n_frames, self.frame_samples, len(self.channels)))
+
+    def __len__(self):
+        return self.n_frames
+
+    def __getitem__(self, index):
+        # (channels, frame_samples) unscaled samples, the same layout ScanSession reduces
+        if not -self.n_frames <= index < self.n_frames:
+            raise IndexError(f"Frame {index} out of range for a recording of {self.n_frames} frames.")
+        return self.data[index].T
+
+    def __iter__(self):
+        for i in range(self.n_frames):
+            yield self[i]
+
+    def volts(self, index):
+        raw = self[index]
+        return np.stack([np.polynomial.polynomial.polyval(raw[ch], c) for ch, c in enumerate(self.coeffs)])
+
+    def galvo(self, **overrides):
+        # the recorded geometry, e.g. galvo(settle_samples=3) to reduce again with a different dwell split
+        config = {key: self.header['galvo'][key] for key in GALVO_DEFAULTS}
+        config.update(overrides)
+        return Galvo(config)
+
+    def close(self):
+        self.data = None  # the mapping goes away with the last view into it
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,110 +1,504 @@
 import nidaqmx
-from nidaqmx.constants import AcquisitionType, LineGrouping
+import threading
+from types import SimpleNamespace
+from nidaqmx.constants import AcquisitionType, LineGrouping, TaskMode
 from nidaqmx.errors import DaqWarning
+from nidaqmx.stream_readers import AnalogMultiChannelReader, AnalogUnscaledReader
+from nidaqmx.stream_writers import AnalogMultiChannelWriter, DigitalMultiChannelWriter
 import numpy as np
 from pyrpoc.helpers.galvo_funcs import Galvo
+from pyrpoc.helpers.do_compiler import compile_do, port_channel_names
+from pyrpoc.helpers.pixel_reduce import (reduce_pixels, phase_pixels, estimate_line_phase, max_line_phase,
+                                         chunk_rows_for, scale_pixels, CHUNKED_FRAME_BYTES)
 import matplotlib.pyplot as plt
 from PIL import Image, ImageTk, ImageDraw, ImageOps
 import warnings
 warnings.filterwarnings("ignore", category=DaqWarning, message=".*200011.*")
 
-def run_scan(ai_channels, galvo, modulate=False, mod_do_chans=None, mod_masks=None):
-    if isinstance(ai_channels, str):
-        ai_channels = [ai_channels]
-
-    has_mods = modulate and mod_do_chans and mod_masks and (len(mod_do_chans) == len(mod_masks))
-    
-    composite_wave = galvo.waveform.copy()
-    total_samps = galvo.total_samples
-
-    with nidaqmx.Task() as ao_task, nidaqmx.Task() as ai_task, nidaqmx.Task() as do_task:
-        for chan in galvo.ao_chans:
-            ao_task.ao_channels.add_ao_voltage_chan(f"{galvo.device}/{chan}")
-        for ch in ai_channels:
-            ai_task.ai_channels.add_ai_voltage_chan(ch)
-
-        ao_task.timing.cfg_samp_clk_timing(
-            rate=galvo.rate,
-            sample_mode=AcquisitionType.FINITE,
-            samps_per_chan=total_samps
-        )
-        ai_task.timing.cfg_samp_clk_timing(
-            rate=galvo.rate,
-            source=f"/{galvo.device}/ao/SampleClock",
-            sample_mode=AcquisitionType.FINITE,
-            samps_per_chan=total_samps
-        )
+# everything ScanSession needs from the driver, swapped for a FakeDAQ to run the same code without a card
+NIDAQMX_BACKEND = SimpleNamespace(
+    Task=nidaqmx.Task,
+    AnalogMultiChannelReader=AnalogMultiChannelReader,
+    AnalogUnscaledReader=AnalogUnscaledReader,
+    AnalogMultiChannelWriter=AnalogMultiChannelWriter,
+    DigitalMultiChannelWriter=DigitalMultiChannelWriter,
+)
 
-        if has_mods:
-            ttl_signals = []
-            for m in mod_masks:
-                m_arr = np.array(m) if isinstance(m, Image.Image) else m
-                m_arr = m_arr > 0 # pretty sure that its a unint8, could be 0 to 1 as well so to be safe just > 0
-                padded = []
-                for row in range(galvo.numsteps_y):
-                    padded_row = np.concatenate((
-                        np.zeros(galvo.extrasteps_left, dtype=bool),
-                        m_arr[row, :],
-                        np.zeros(galvo.extrasteps_right, dtype=bool)
-                    ))
-                    padded.append(padded_row)
-                flat = np.repeat(np.array(padded).ravel(), galvo.pixel_samples).astype(bool)
-                ttl_signals.append(flat)
-            
-            if len(mod_do_chans) == 1:
-                line = mod_do_chans[0]
-                do_task.do_channels.add_do_chan(f"{galvo.device}/{line}")
-                do_task.timing.cfg_samp_clk_timing(
-                    rate=galvo.rate,
-                    source=f"/{galvo.device}/ao/SampleClock",
-                    sample_mode=AcquisitionType.FINITE,
-                    samps_per_chan=total_samps
-                )
-                do_task.write(ttl_signals[0].tolist(), auto_start=False)
-            else:
-                for chan in mod_do_chans:
-                    do_task.do_channels.add_do_chan(f"{galvo.device}/{chan}")
-                do_task.timing.cfg_samp_clk_timing(
+class ScanSession:
+    # long-lived ao/ai/do tasks, configured and committed once and then restarted for every frame
+    # buffers are only rewritten when the galvo parameters or the masks actually change
+    def __init__(self, backend=None):
+        self.backend = NIDAQMX_BACKEND if backend is None else backend
+        self.ao_task = None
+        self.ai_task = None
+        self.do_task = None
+        self.ai_reader = None
+        self.ai_raw_reader = None
+        self.ao_writer = None
+        self.do_writer = None
+        self.ai_buffer = None
+        self.ai_scaling = None  # (per channel raw -> volts coefficients, raw integer dtype) of the ai task
+        self.raw_block = None
+        self.do_words = None
+        self.task_key = None
+        self.do_key = None
+        self.waveform_key = None
+        self.lock = threading.Lock()
+        self.recorder = None  # a RawRecorder gets the unscaled samples of every fixed-dwell frame while set
+
+        # row streaming state, filled by the every-n-samples callback while a frame is running
+        self.stream_key = None
+        self.stream_samples = 0
+        self.stream_block = None
+        self.stream_galvo = None
+        self.stream_frame = None
+        self.stream_rows = 0
+        self.stream_phase = 0
+        self.stream_phase_pairs = 1
+        self.stream_phase_rows = []
+        self.stream_on_rows = None
+        self.stream_error = None
+        self.stream_done = threading.Event()
+
+        # forward/backward line offset of bidirectional scans, per scan geometry
+        self.line_phases = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def scan(self, ai_channels, galvo, modulate=False, mod_do_chans=None, mod_masks=None, on_rows=None, rows_per_block=None, on_acquired=None, on_frame=None, chunk_rows=None):
+        # on_rows(frame, rows_done) switches to streaming, it is called from the daq callback thread
+        # with the partially assembled (channels, y, x) frame after every block of rows
+        # on_acquired() is called as soon as the samples are in, before the frame is reduced
+        # bursts (galvo.frames > 1) call on_frame(index, frame) for every frame as soon as it is reduced,
+        # and return the list of all frames
+        # chunk_rows reads unscaled integer samples that many rows at a time, None picks it automatically for
+        # frames too big to buffer as float64 and 0 always reads the whole frame
+        # while a recorder is attached every fixed-dwell frame goes through the chunked path, streamed rows included
+        if isinstance(ai_channels, str):
+            ai_channels = [ai_channels]
+
+        has_mods = modulate and mod_do_chans and mod_masks and (len(mod_do_chans) == len(mod_masks))
+
+        with self.lock:
+            try:
+                self.configure(ai_channels, galvo, mod_do_chans if has_mods else None)
+                self.write_waveform(galvo)
+                if has_mods:
+                    self.write_masks(galvo, mod_do_chans, mod_masks)
+                mode, rows = self.resolve_read(galvo, chunk_rows, on_rows is not None, rows_per_block)
+                if galvo.frames > 1:
+                    frames = self.run_burst(galvo, has_mods, len(ai_channels), on_frame, rows)
+                    if on_acquired is not None:
+                        on_acquired()
+                    return frames
+                if mode == 'stream':
+                    self.configure_stream(galvo, rows)
+                    frame = self.run_frame_streaming(galvo, has_mods, on_rows)
+                    acq_data = None
+                elif mode == 'chunked':
+                    frame = self.run_frame_chunked(galvo, has_mods, rows, on_rows)
+                    acq_data = None
+                else:
+                    acq_data = self.run_frame(galvo, has_mods)
+            except Exception:
+                # the tasks are in an unknown state now, rebuild everything on the next frame
+                self.close()
+                raise
+
+            # the scanner is idle from here on, e.g. the next stage move can start while this frame is reduced
+            if on_acquired is not None:
+                on_acquired()
+            if acq_data is None:
+                return list(frame)
+
+            # reduced while still holding the lock, the raw buffer is reused by the next frame
+            line_phase = self.update_line_phase(galvo, acq_data) if galvo.bidirectional else 0
+            return reduce_frame(acq_data, galvo, len(ai_channels), line_phase)
+
+    def update_line_phase(self, galvo, acq_data):
+        # re-estimated from every full frame
+        return self.store_line_phase(galvo, phase_pixels(acq_data, galvo))
+
+    def store_line_phase(self, galvo, pixels):
+        # frames without enough structure keep the previous estimate
+        key = galvo.scan_key()
+        estimate = estimate_line_phase(pixels, max_line_phase(galvo))
+        if estimate is not None:
+            self.line_phases[key] = estimate
+        return self.line_phases.get(key, 0)
+
+    def configure(self, ai_channels, galvo, do_chans=None):
+        task_key = (galvo.device, tuple(galvo.ao_chans), tuple(ai_channels), galvo.rate, galvo.total_samples)
+        if task_key != self.task_key:
+            self.close()
+            self.ao_task = self.backend.Task()
+            self.ai_task = self.backend.Task()
+            for chan in galvo.ao_chans:
+                self.ao_task.ao_channels.add_ao_voltage_chan(f"{galvo.device}/{chan}")
+            for ch in ai_channels:
+                self.ai_task.ai_channels.add_ai_voltage_chan(ch)
+
+            self.ao_task.timing.cfg_samp_clk_timing(
+                rate=galvo.rate,
+                sample_mode=AcquisitionType.FINITE,
+                samps_per_chan=galvo.total_samples
+            )
+            self.ai_task.timing.cfg_samp_clk_timing(
+                rate=galvo.rate,
+                source=f"/{galvo.device}/ao/SampleClock",
+                sample_mode=AcquisitionType.FINITE,
+                samps_per_chan=galvo.total_samples
+            )
+            # committing once means stop()/start() per frame skips verify/reserve/commit entirely
+            self.ao_task.control(TaskMode.TASK_COMMIT)
+            self.ai_task.control(TaskMode.TASK_COMMIT)
+
+            # stream readers/writers move numpy buffers straight into the driver, no python lists involved
+            self.ao_writer = self.backend.AnalogMultiChannelWriter(self.ao_task.out_stream, auto_start=False)
+            self.ai_reader = self.backend.AnalogMultiChannelReader(self.ai_task.in_stream)
+            self.ai_raw_reader = self.backend.AnalogUnscaledReader(self.ai_task.in_stream)
+            self.ai_scaling = None
+            self.n_channels = len(ai_channels)
+            self.ai_channel_names = list(ai_channels)
+            self.task_key = task_key
+
+        do_key = (tuple(do_chans), task_key) if do_chans else None
+        if do_key != self.do_key:
+            if self.do_task is not None:
+                self.do_task.close()
+                self.do_task = None
+                self.do_writer = None
+            if do_chans:
+                self.do_task = self.backend.Task()
+                # one channel per port holding all of its modulation lines, written as packed uint32 words
+                for port_chan in port_channel_names(galvo.device, do_chans):
+                    self.do_task.do_channels.add_do_chan(port_chan, line_grouping=LineGrouping.CHAN_FOR_ALL_LINES)
+                self.do_task.timing.cfg_samp_clk_timing(
                     rate=galvo.rate,
                     source=f"/{galvo.device}/ao/SampleClock",
                     sample_mode=AcquisitionType.FINITE,
-                    samps_per_chan=total_samps
+                    samps_per_chan=galvo.total_samples
                 )
-                data_to_write = [sig.tolist() for sig in ttl_signals]
-                do_task.write(data_to_write, auto_start=False)
+                self.do_task.control(TaskMode.TASK_COMMIT)
+                self.do_writer = self.backend.DigitalMultiChannelWriter(self.do_task.out_stream, auto_start=False)
+            self.do_key = do_key
+            self.do_words = None
+
+    def write_waveform(self, galvo):
+        waveform_key = galvo.scan_key()
+        if waveform_key == self.waveform_key:
+            return
+        self.ao_writer.write_many_sample(np.ascontiguousarray(galvo.waveform, dtype=np.float64))
+        self.waveform_key = waveform_key
+
+    def write_masks(self, galvo, mod_do_chans, mod_masks):
+        # compile_do is cached on mask content, so an unchanged mask hands back the very same buffer
+        # backward rows are placed with the phase the frame will be reduced with
+        line_phase = self.line_phases.get(galvo.scan_key(), 0) if galvo.bidirectional else 0
+        do_words = compile_do(galvo, mod_do_chans, mod_masks, line_phase)
+        if do_words is self.do_words:
+            return
+        self.do_writer.write_many_sample_port_uint32(do_words)
+        self.do_words = do_words
+
+    def raw_scaling(self):
+        # queried from the driver once per ai task, devices wider than 16 bits deliver int32 raw samples
+        if self.ai_scaling is None:
+            channels = [self.ai_task.ai_channels[i] for i in range(self.n_channels)]
+            coeffs = [np.asarray(ch.ai_dev_scaling_coeff, dtype=np.float64) for ch in channels]
+            bits = max(ch.ai_raw_samp_size for ch in channels)
+            self.ai_scaling = (coeffs, np.dtype(np.int16 if bits <= 16 else np.int32))
+        return self.ai_scaling
+
+    def resolve_read(self, galvo, chunk_rows, streaming=False, rows_per_block=None):
+        # how a frame is read: ('stream', rows per block) through the daq callback, ('chunked', rows) as unscaled
+        # integers a chunk of rows at a time, or ('whole', 0) into one float64 buffer. bursts never stream
+        # variable dwell rows have different lengths, those frames are always read in one go
+        if galvo.pixel_map is not None:
+            return 'whole', 0
+        if streaming and galvo.frames == 1 and self.recorder is None:
+            rows_per_block = rows_per_block or 1
+            if galvo.bidirectional and galvo.total_y > 1:
+                # blocks hold whole row pairs too, so every block can add to the line phase estimate
+                rows_per_block = max(2, rows_per_block - rows_per_block % 2)
+            return 'stream', rows_per_block
+        if self.recorder is not None and not chunk_rows:
+            # recording needs the unscaled samples, streamed frames keep their block size
+            chunk_rows = (rows_per_block if streaming else None) or chunk_rows_for(galvo, self.n_channels, self.raw_scaling()[1].itemsize)
+        if chunk_rows == 0:
+            return 'whole', 0
+        if chunk_rows is None:
+            if self.n_channels * galvo.frame_samples * 8 <= CHUNKED_FRAME_BYTES:
+                return 'whole', 0
+            chunk_rows = chunk_rows_for(galvo, self.n_channels, self.raw_scaling()[1].itemsize)
+        chunk_rows = max(1, min(int(chunk_rows), galvo.total_y))
+        if galvo.bidirectional and galvo.total_y > 1:
+            # chunks start on forward rows and hold whole forward/backward pairs, so phase row pairs never
+            # straddle two chunks and the first chunk always has a pair to estimate the line phase from
+            chunk_rows = max(2, chunk_rows - chunk_rows % 2)
+        return 'chunked', chunk_rows
 
-        ao_task.write(composite_wave, auto_start=False)
-        ai_task.start()
+    def configure_stream(self, galvo, rows_per_block):
+        rows_per_block = max(1, min(int(rows_per_block), galvo.total_y))
+        row_samples = galvo.total_x * galvo.pixel_samples
+        stream_key = (rows_per_block, self.task_key)
+        if stream_key == self.stream_key:
+            return
+        # events can only be (un)registered while the task is not running, which is always the case between frames
+        if self.stream_key is not None:
+            self.ai_task.register_every_n_samples_acquired_into_buffer_event(self.stream_samples, None)
+        self.stream_samples = rows_per_block * row_samples
+        self.stream_block = np.empty((self.n_channels, self.stream_samples), dtype=np.float64)
+        self.ai_task.register_every_n_samples_acquired_into_buffer_event(self.stream_samples, self.on_samples_acquired)
+        self.stream_key = stream_key
+
+    def start_tasks(self, has_mods):
+        self.ai_task.start()
+        if has_mods:
+            self.do_task.start()
+        self.ao_task.start()
+
+    def wait_tasks(self, has_mods, timeout):
+        self.ao_task.wait_until_done(timeout=timeout)
+        self.ai_task.wait_until_done(timeout=timeout)
         if has_mods:
-            do_task.start()
-        ao_task.start()
+            self.do_task.wait_until_done(timeout=timeout)
 
-        ao_task.wait_until_done(timeout=total_samps / galvo.rate + 5)
-        ai_task.wait_until_done(timeout=total_samps / galvo.rate + 5)
+    def stop_tasks(self, has_mods):
+        # stopping a committed task drops it back to the committed state, so the next start is cheap
+        self.ao_task.stop()
+        self.ai_task.stop()
         if has_mods:
-            do_task.wait_until_done(timeout=total_samps / galvo.rate + 5)
+            self.do_task.stop()
+
+    def run_frame(self, galvo, has_mods):
+        total_samps = galvo.total_samples
+        timeout = total_samps / galvo.rate + 5
+        if self.ai_buffer is None or self.ai_buffer.shape != (self.n_channels, total_samps):
+            self.ai_buffer = np.empty((self.n_channels, total_samps), dtype=np.float64)
+
+        self.start_tasks(has_mods)
+        try:
+            self.wait_tasks(has_mods, timeout)
+            self.ai_reader.read_many_sample(self.ai_buffer, number_of_samples_per_channel=total_samps, timeout=timeout)
+        finally:
+            self.stop_tasks(has_mods)
+        # the buffer is recycled next frame, so anything kept past the reduction has to be copied
+        return self.ai_buffer
+
+    def run_frame_chunked(self, galvo, has_mods, chunk_rows, on_rows=None):
+        timeout = galvo.total_samples / galvo.rate + 5
+        self.start_tasks(has_mods)
+        try:
+            frame = self.read_frame_chunked(galvo, chunk_rows, timeout, on_rows)
+            self.wait_tasks(has_mods, timeout)
+        finally:
+            self.stop_tasks(has_mods)
+        return frame
+
+    def read_frame_chunked(self, galvo, chunk_rows, timeout, on_rows=None):
+        # one frame of unscaled samples, read and reduced chunk_rows rows at a time while the scan is running,
+        # so only a chunk of raw data is ever held, and scaling to volts is applied to the finished pixels
+        # on_rows(frame, rows_done) gets the frame after every chunk, like streaming
+        coeffs, dtype = self.raw_scaling()
+        recorder = self.recorder
+        if recorder is not None:
+            recorder.begin_frame(galvo, self.ai_channel_names, coeffs, dtype)
+        try:
+            frame = self.read_chunks(galvo, chunk_rows, timeout, on_rows, coeffs, dtype, recorder)
+        except Exception:
+            if recorder is not None:
+                recorder.abort_frame()
+            raise
+        if recorder is not None:
+            recorder.end_frame()
+        return frame
+
+    def read_chunks(self, galvo, chunk_rows, timeout, on_rows, coeffs, dtype, recorder):
+        row_samples = galvo.total_x * galvo.pixel_samples
+        if self.raw_block is None or self.raw_block.shape != (self.n_channels, chunk_rows * row_samples) or self.raw_block.dtype != dtype:
+            self.raw_block = np.empty((self.n_channels, chunk_rows * row_samples), dtype=dtype)
+        read = self.ai_raw_reader.read_int16 if dtype == np.int16 else self.ai_raw_reader.read_int32
+
+        # rows are reduced as they arrive, so they use the phase estimated before this frame and the
+        # estimate from the whole frame is kept for the next one
+        line_phase = self.line_phases.get(galvo.scan_key()) if galvo.bidirectional else 0
+        pairs_per_chunk = -(-32 * chunk_rows // galvo.total_y)
+        phase_rows = []
+        frame = np.empty((self.n_channels, galvo.numsteps_y, galvo.numsteps_x), dtype=np.float32)
+        for row in range(0, galvo.total_y, chunk_rows):
+            nrows = min(chunk_rows, galvo.total_y - row)
+            # readers need contiguous buffers, the last partial chunk gets its own
+            block = self.raw_block if nrows == chunk_rows else np.empty((self.n_channels, nrows * row_samples), dtype=dtype)
+            read(block, number_of_samples_per_channel=block.shape[1], timeout=timeout)
+            if recorder is not None:
+                recorder.write(block)
+            if galvo.bidirectional:
+                phase_rows.append(phase_pixels(block, galvo, pairs_per_chunk))
+                if line_phase is None:
+                    # first frame of this geometry, the first chunk has to do
+                    line_phase = self.store_line_phase(galvo, phase_rows[0])
+            scale_pixels(reduce_pixels(block, galvo, line_phase, row, out=frame[:, row:row + nrows]), coeffs)
+            if on_rows is not None:
+                on_rows(frame, row + nrows)
+
+        if galvo.bidirectional:
+            self.store_line_phase(galvo, np.concatenate(phase_rows))
+        return frame
+
+    def run_burst(self, galvo, has_mods, n_channels, on_frame=None, chunk_rows=0):
+        # one finite task for all frames, every frame is read and reduced while the next one is being scanned,
+        # so frame intervals are set by the sample clock alone
+        frame_samps = galvo.frame_samples
+        timeout = frame_samps / galvo.rate + 5
+        if not chunk_rows and (self.ai_buffer is None or self.ai_buffer.shape != (self.n_channels, frame_samps)):
+            self.ai_buffer = np.empty((self.n_channels, frame_samps), dtype=np.float64)
+
+        frames = []
+        self.start_tasks(has_mods)
+        try:
+            for idx in range(galvo.frames):
+                if chunk_rows:
+                    frame = list(self.read_frame_chunked(galvo, chunk_rows, timeout))
+                else:
+                    self.ai_reader.read_many_sample(self.ai_buffer, number_of_samples_per_channel=frame_samps, timeout=timeout)
+                    line_phase = self.update_line_phase(galvo, self.ai_buffer) if galvo.bidirectional else 0
+                    frame = reduce_frame(self.ai_buffer, galvo, n_channels, line_phase)
+                frames.append(frame)
+                if on_frame is not None:
+                    on_frame(idx, frame)
+            self.wait_tasks(has_mods, timeout)
+        finally:
+            self.stop_tasks(has_mods)
+        return frames
+
+    def run_frame_streaming(self, galvo, has_mods, on_rows):
+        timeout = galvo.total_samples / galvo.rate + 5
+        row_samples = galvo.total_x * galvo.pixel_samples
+        rows_per_block = self.stream_samples // row_samples
+
+        self.stream_galvo = galvo
+        # rows are reduced as they arrive, like read_chunks they use the phase estimated before this frame,
+        # or from the first block if there is none yet, and the estimate from the whole frame is kept
+        self.stream_phase = self.line_phases.get(galvo.scan_key()) if galvo.bidirectional else 0
+        self.stream_phase_pairs = -(-32 * rows_per_block // galvo.total_y)
+        self.stream_phase_rows = []
+        self.stream_frame = np.zeros((self.n_channels, galvo.numsteps_y, galvo.numsteps_x), dtype=np.float32)
+        self.stream_rows = 0
+        self.stream_full_rows = (galvo.total_y // rows_per_block) * rows_per_block
+        self.stream_on_rows = on_rows
+        self.stream_error = None
+        self.stream_done.clear()
+
+        self.start_tasks(has_mods)
+        try:
+            self.wait_tasks(has_mods, timeout)
+            if self.stream_full_rows and not self.stream_done.wait(timeout):
+                raise TimeoutError("Timed out waiting for the streamed rows to be read.")
+            if self.stream_error is not None:
+                raise self.stream_error
+
+            # the last partial block never fires the event, pick it up here
+            remaining = galvo.total_y - self.stream_rows
+            if remaining:
+                tail = np.empty((self.n_channels, remaining * row_samples), dtype=np.float64)
+                self.ai_reader.read_many_sample(tail, number_of_samples_per_channel=tail.shape[1], timeout=timeout)
+                self.collect_stream_phase(tail)
+                self.stream_rows = reduce_rows(tail, galvo, self.stream_frame, self.stream_rows, self.stream_phase)
+                on_rows(self.stream_frame, self.stream_rows)
+        finally:
+            self.stop_tasks(has_mods)
+            self.stream_on_rows = None
+
+        if galvo.bidirectional and self.stream_phase_rows:
+            self.store_line_phase(galvo, np.concatenate(self.stream_phase_rows))
+        return self.stream_frame
+
+    def collect_stream_phase(self, block):
+        galvo = self.stream_galvo
+        if not galvo.bidirectional:
+            return
+        self.stream_phase_rows.append(phase_pixels(block, galvo, self.stream_phase_pairs))
+        if self.stream_phase is None:
+            # first frame of this geometry, the first block has to do
+            self.stream_phase = self.store_line_phase(galvo, self.stream_phase_rows[0])
+
+    def on_samples_acquired(self, task_handle, event_type, number_of_samples, callback_data):
+        if self.stream_on_rows is None or self.stream_done.is_set():
+            return 0
+        try:
+            self.ai_reader.read_many_sample(self.stream_block, number_of_samples_per_channel=number_of_samples, timeout=5)
+            self.collect_stream_phase(self.stream_block)
+            self.stream_rows = reduce_rows(self.stream_block, self.stream_galvo, self.stream_frame, self.stream_rows, self.stream_phase)
+            self.stream_on_rows(self.stream_frame, self.stream_rows)
+        except Exception as e:
+            self.stream_error = e
+            self.stream_done.set()
+            return 0
+        if self.stream_rows >= self.stream_full_rows:
+            self.stream_done.set()
+        return 0
+
+    def close(self):
+        for task in (self.ao_task, self.ai_task, self.do_task):
+            if task is not None:
+                try:
+                    task.close()
+                except Exception as e:
+                    print(f"[WARNING] Failed to close DAQ task: {e}")
+        self.ao_task = None
+        self.ai_task = None
+        self.do_task = None
+        self.ai_reader = None
+        self.ai_raw_reader = None
+        self.ao_writer = None
+        self.do_writer = None
+        self.ai_buffer = None
+        self.ai_scaling = None
+        self.raw_block = None
+        self.do_words = None
+        self.task_key = None
+        self.do_key = None
+        self.waveform_key = None
+        self.stream_key = None
+        self.stream_block = None
+
+
+def reduce_frame(acq_data, galvo, n_channels, line_phase=0):
+    if galvo.pixel_map is not None:
+        results = []
+        for i in range(n_channels):
+            pixel_values = interpret_DAQ_output(acq_data[i], galvo.rpoc_mask, galvo.pixel_map, galvo)
+            results.append(pixel_values[:, galvo.extrasteps_left:galvo.extrasteps_left + galvo.numsteps_x].astype(np.float32))
+        return results
+
+    return list(reduce_pixels(acq_data[:n_channels], galvo, line_phase))
+
 
-        acq_data = np.array(ai_task.read(number_of_samples_per_channel=total_samps))
+def reduce_rows(block, galvo, out, row_start, line_phase=0):
+    # reduces whole rows of raw samples into out[:, row_start:...], same pixel values as reduce_frame
+    nrows = block.shape[1] // (galvo.total_x * galvo.pixel_samples)
+    reduce_pixels(block, galvo, line_phase, row_start, out=out[:, row_start:row_start + nrows])
+    return row_start + nrows
 
-    results = []
-    for i in range(len(ai_channels)):
-        channel_data = acq_data if len(ai_channels) == 1 else acq_data[i]
-        reshaped = channel_data.reshape(galvo.total_y, galvo.total_x, galvo.pixel_samples)
-        pixel_values = np.mean(reshaped, axis=2)
-        cropped = pixel_values[:, galvo.extrasteps_left:galvo.extrasteps_left + galvo.numsteps_x]
-        results.append(cropped)
 
-    return results
+def run_scan(ai_channels, galvo, modulate=False, mod_do_chans=None, mod_masks=None, session=None, on_rows=None, rows_per_block=None, on_acquired=None, on_frame=None, backend=None, chunk_rows=None):
+    # pass a ScanSession to reuse its tasks across frames, otherwise a throwaway one is built for this frame
+    kwargs = dict(modulate=modulate, mod_do_chans=mod_do_chans, mod_masks=mod_masks, on_rows=on_rows, rows_per_block=rows_per_block, on_acquired=on_acquired, on_frame=on_frame, chunk_rows=chunk_rows)
+    if session is not None:
+        return session.scan(ai_channels, galvo, **kwargs)
+    with ScanSession(backend) as throwaway:
+        return throwaway.scan(ai_channels, galvo, **kwargs)
 
 
 def interpret_DAQ_output(ai_data_1d, mask, pixel_map, galvo):
-    num_y, total_x = pixel_map.shape
-    pixel_values_2d = np.zeros((num_y, total_x), dtype=float)
-    cursor = 0
-    for row_idx in range(num_y):
-        for col_idx in range(total_x):
-            samps = pixel_map[row_idx, col_idx]
-            pixel_block = ai_data_1d[cursor:cursor + samps]
-            cursor += samps
-            pixel_values_2d[row_idx, col_idx] = np.mean(pixel_block)
-    return pixel_values_2d
\ No newline at end of file
+    # pixel_map holds the number of samples of every pixel, the pixel boundaries are its running sum
+    counts = pixel_map.ravel()
+    offsets = np.zeros(counts.size, dtype=np.int64)
+    np.cumsum(counts[:-1], out=offsets[1:])
+    sums = np.add.reduceat(ai_data_1d[:offsets[-1] + counts[-1]], offsets)
+    return (sums / counts).reshape(pixel_map.shape)
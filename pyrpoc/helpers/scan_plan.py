@@ -0,0 +1,76 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+from pyrpoc.helpers.galvo_funcs import Galvo, GALVO_DEFAULTS
+from pyrpoc.helpers.do_compiler import mask_digest
+
+# compiled plans for recently used configs, bounded so stale geometries don't pile up in memory
+_PLAN_CACHE_SIZE = 8
+_plans = OrderedDict()
+_plans_lock = threading.Lock()
+
+
+class ScanPlan:
+    # everything a frame needs that only depends on the config (+ masks for variable dwell), compiled once
+    # and never mutated. the do words are compiled by the scan session, they also depend on the line phase
+    def __init__(self, galvo):
+        if galvo.waveform is not None:
+            galvo.waveform.setflags(write=False)
+        fields = {
+            'galvo': galvo,
+            'frames': galvo.frames,
+        }
+        for name, val in fields.items():
+            object.__setattr__(self, name, val)
+
+    def __setattr__(self, name, val):
+        raise AttributeError("ScanPlan is immutable, compile a new one with get_plan().")
+
+
+def galvo_config(config):
+    # only the keys Galvo actually uses, so renaming a channel etc. doesn't invalidate a plan
+    return {key: config[key] for key in GALVO_DEFAULTS if config and key in config}
+
+
+def plan_key(config, masks=None, dwell_multiplier=None, frames=1):
+    items = []
+    for key, val in sorted(galvo_config(config).items()):
+        items.append((key, tuple(val) if isinstance(val, list) else val))
+    # only variable dwell rasters depend on the masks
+    mask_part = tuple(mask_digest(m) for m in masks) if dwell_multiplier is not None else ()
+    return (tuple(items), mask_part, dwell_multiplier, frames)
+
+
+def get_plan(config, masks=None, dwell_multiplier=None, frames=1):
+    # a dwell_multiplier switches to variable dwell, masked pixels are scanned that many times slower
+    # frames > 1 compiles a burst, the raster repeated that many times in one finite task
+    if not masks:
+        dwell_multiplier = None
+    frames = max(1, int(frames))
+    key = plan_key(config, masks, dwell_multiplier, frames)
+    with _plans_lock:
+        if key in _plans:
+            _plans.move_to_end(key)
+            return _plans[key]
+
+    if dwell_multiplier is not None:
+        plan = compile_variable_plan(config, masks, dwell_multiplier)
+    else:
+        plan = ScanPlan(Galvo(galvo_config(config), frames=frames))
+
+    with _plans_lock:
+        _plans[key] = plan
+        while len(_plans) > _PLAN_CACHE_SIZE:
+            _plans.popitem(last=False)
+    return plan
+
+
+def compile_variable_plan(config, masks, dwell_multiplier):
+    union = np.logical_or.reduce([np.asarray(m) > 0 for m in masks])
+    galvo = Galvo(galvo_config(config), rpoc_mask=union, rpoc_mode="variable", dwell_multiplier=dwell_multiplier)
+    return ScanPlan(galvo)
+
+
+def clear_plans():
+    with _plans_lock:
+        _plans.clear()
@@ -0,0 +1,154 @@
+import math
+import threading
+from types import SimpleNamespace
+from pyrpoc.helpers.galvo_funcs import GALVO_DEFAULTS, pixel_samples_for
+from pyrpoc.helpers.do_compiler import port_groups
+from pyrpoc.helpers.pixel_reduce import CHUNKED_FRAME_BYTES, chunk_rows_for
+
+# fraction of numsteps_x each side is assumed to need for a unidirectional flyback, and the floor for
+# bidirectional turnarounds, used only for suggestions, the real minimum depends on the galvos
+FLYBACK_FRACTION = 0.05
+BIDIRECTIONAL_EXTRASTEPS = 8
+
+_limits = {}
+_limits_lock = threading.Lock()
+
+
+def device_ai_limits(device):
+    # (max single channel rate, max multi channel rate, simultaneous sampling) from the driver, None if unknown
+    with _limits_lock:
+        if device in _limits:
+            return _limits[device]
+    try:
+        import nidaqmx.system
+        dev = nidaqmx.system.Device(device)
+        limits = (dev.ai_max_single_chan_rate, dev.ai_max_multi_chan_rate, dev.ai_simultaneous_sampling_supported)
+    except Exception:
+        limits = None  # no driver or no such device, e.g. simulated data on a laptop
+    with _limits_lock:
+        _limits[device] = limits
+    return limits
+
+
+def scan_throughput(config, n_ai=None, do_chans=(), frames=1, ai_limits=None):
+    # predicts what one frame costs for a config, without building any waveforms
+    cfg = dict(GALVO_DEFAULTS)
+    cfg.update(config or {})
+    n_ai = len(cfg.get('ai_chans', [])) if n_ai is None else n_ai
+    rate = float(cfg['rate'])
+    nx, ny = int(cfg['numsteps_x']), int(cfg['numsteps_y'])
+    total_x = nx + int(cfg['extrasteps_left']) + int(cfg['extrasteps_right'])
+
+    requested = cfg['dwell'] * rate
+    pixel_samples = pixel_samples_for(cfg['dwell'], rate)
+    frame_samples = total_x * ny * pixel_samples
+    frame_time = frame_samples / rate
+    n_ports = len(port_groups(do_chans)) if do_chans else 0
+    raw_bytes = n_ai * frame_samples * 8
+    # ScanSession reads frames this big as int16 chunks of rows, so only one chunk is ever on the host
+    chunk_rows = None
+    ai_host_bytes = raw_bytes
+    if raw_bytes > CHUNKED_FRAME_BYTES:
+        row_samples = total_x * pixel_samples
+        chunk_rows = chunk_rows_for(SimpleNamespace(total_x=total_x, total_y=ny, pixel_samples=pixel_samples), n_ai)
+        ai_host_bytes = n_ai * chunk_rows * row_samples * 2
+
+    report = {
+        'pixel_samples': pixel_samples,
+        'requested_samples': requested,
+        'effective_dwell': pixel_samples / rate,
+        'frame_samples': frame_samples,
+        'frame_time': frame_time,
+        'fps': 1.0 / frame_time if frame_time > 0 else float('inf'),
+        'line_time': total_x * pixel_samples / rate,
+        'duty_cycle': nx / total_x,  # share of the scan spent on image pixels, the rest is turnaround/flyback
+        'n_ai': n_ai,
+        'ai_aggregate_rate': rate * n_ai,
+        'ai_limit': None,
+        'rate_warning': None,  # set when the ai rate is over the device limit, also listed in warnings
+        'raw_bytes_per_frame': raw_bytes,
+        'chunk_rows': chunk_rows,
+        'image_bytes_per_frame': n_ai * nx * ny * 4,
+        # run_scan keeps the ai buffer, the ao waveform and the packed do words, bursts hold frames of them
+        'host_bytes': (ai_host_bytes + (2 * 8 + n_ports * 4) * frame_samples * max(1, frames)
+                       + n_ai * nx * ny * 4 * max(1, frames)),
+        'warnings': [],
+        'suggestions': [],
+    }
+
+    if requested < 1:
+        report['warnings'].append(f"Dwell x rate is {requested:.2f}, every pixel is forced up to 1 sample ({report['effective_dwell'] * 1e6:.2f} us).")
+    elif pixel_samples == 1:
+        report['warnings'].append("Only 1 sample per pixel, there is nothing to average and settle samples are ignored.")
+    elif (requested - pixel_samples) / requested > 0.05:
+        report['warnings'].append(f"Dwell truncates from {requested:.2f} to {pixel_samples} samples per pixel.")
+
+    limits = device_ai_limits(cfg['device']) if ai_limits is None else ai_limits
+    if limits is not None and n_ai:
+        max_single, max_multi, simultaneous = limits
+        # multiplexed boards share one converter, so the aggregate rate across channels is what counts
+        limit = max_single if simultaneous or n_ai == 1 else max_multi / n_ai
+        report['ai_limit'] = limit
+        if rate > limit:
+            report['rate_warning'] = f"{n_ai} AI channel(s) at {rate:.0f} Hz exceed the device limit of {limit:.0f} Hz per channel."
+            report['warnings'].append(report['rate_warning'])
+            report['suggestions'].append(suggestion(
+                f"Lower the rate to {limit:.0f} Hz", dict(cfg, rate=limit), n_ai, report))
+
+    # the other suggestions are made at a rate the device can do, so none of them trades one warning for another
+    base = cfg
+    at_rate = ""
+    if report['rate_warning'] is not None:
+        base = dict(cfg, rate=report['ai_limit'])
+        at_rate = f" at {report['ai_limit']:.0f} Hz"
+        requested = cfg['dwell'] * base['rate']
+        pixel_samples = pixel_samples_for(cfg['dwell'], base['rate'])
+
+    left, right = int(cfg['extrasteps_left']), int(cfg['extrasteps_right'])
+    if not cfg.get('bidirectional'):
+        minimum = max(1, math.ceil(FLYBACK_FRACTION * nx))
+        if left > minimum or right > minimum:
+            report['suggestions'].append(suggestion(
+                f"Fewer extrasteps ({min(left, minimum)} / {min(right, minimum)}){at_rate}",
+                dict(base, extrasteps_left=min(left, minimum), extrasteps_right=min(right, minimum)), n_ai, report))
+        bidi = min(BIDIRECTIONAL_EXTRASTEPS, left, right)
+        if bidi < max(left, right):
+            report['suggestions'].append(suggestion(
+                f"Bidirectional scanning, no flyback so {bidi} extrasteps per side are enough{at_rate}",
+                dict(base, bidirectional=True, extrasteps_left=bidi, extrasteps_right=bidi), n_ai, report))
+
+    if pixel_samples > 1 and abs(requested - round(requested)) > 1e-6:
+        report['suggestions'].append(suggestion(
+            f"Dwell {pixel_samples / base['rate'] * 1e6:.3g} us, a whole number of samples{at_rate}",
+            dict(base, dwell=pixel_samples / base['rate']), n_ai, report))
+
+    report['suggestions'].sort(key=lambda s: s['fps'], reverse=True)
+    limit = report['ai_limit']
+    gains = [s for s in report['suggestions']
+             if s['fps'] > report['fps'] * 1.01 and (limit is None or s['rate'] <= limit)]
+    report['best'] = gains[0] if gains else None
+    return report
+
+
+def suggestion(text, cfg, n_ai, current):
+    pixel_samples = pixel_samples_for(cfg['dwell'], cfg['rate'])
+    total_x = int(cfg['numsteps_x']) + int(cfg['extrasteps_left']) + int(cfg['extrasteps_right'])
+    frame_time = total_x * int(cfg['numsteps_y']) * pixel_samples / float(cfg['rate'])
+    return {'text': text, 'rate': float(cfg['rate']), 'frame_time': frame_time, 'fps': 1.0 / frame_time,
+            'gain': current['frame_time'] / frame_time}
+
+
+def format_report(report):
+    lines = [
+        f"Frame {report['frame_time'] * 1e3:.0f} ms ({report['fps']:.2f} fps), {report['pixel_samples']} samples/pixel, "
+        f"{100 * (1 - report['duty_cycle']):.0f}% flyback",
+        f"{report['raw_bytes_per_frame'] / 1e6:.1f} MB raw/frame, {report['host_bytes'] / 1e6:.1f} MB host buffers",
+    ]
+    if report['chunk_rows'] is not None:
+        lines[-1] += f" (read in {report['chunk_rows']} row chunks)"
+    for warning in report['warnings']:
+        lines.append(f"⚠ {warning}")
+    if report['best'] is not None:
+        best = report['best']
+        lines.append(f"Best: {best['text']} -> {best['fps']:.2f} fps (x{best['gain']:.2f})")
+    return "\n".join(lines)
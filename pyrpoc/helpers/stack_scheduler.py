@@ -0,0 +1,39 @@
+import time
+
+
+class StackScheduler:
+    # overlaps stage motion with everything that isn't scanning: the move to step i+1 is issued the moment
+    # scan i has its samples, while scan i is reduced and earlier frames are converted/saved on the pipeline,
+    # and only scan i+1 waits for the motion to complete
+    def __init__(self, start_move, wait_move, positions):
+        # start_move(position) must only issue the move, wait_move() blocks until the stage is idle
+        self.start_move = start_move
+        self.wait_move = wait_move
+        self.positions = list(positions)
+        self.issued = -1  # index of the last move that was sent
+        self.settled = -1  # index of the last move known to be complete
+        self.move_wait = 0.0  # seconds scans spent waiting on the stage
+
+    def issue(self, i):
+        if i < len(self.positions) and i > self.issued:
+            self.start_move(self.positions[i])
+            self.issued = i
+
+    def wait_ready(self, i):
+        # call right before scan i
+        self.issue(i)
+        if self.settled < i:
+            start = time.perf_counter()
+            self.wait_move()
+            self.move_wait += time.perf_counter() - start
+            self.settled = i
+
+    def advance(self, i):
+        # call as soon as scan i has finished acquiring
+        self.issue(i + 1)
+
+    def finish(self):
+        # never leave the stage mid-move, e.g. after a stop during a stack
+        if self.issued > self.settled:
+            self.wait_move()
+            self.settled = self.issued
@@ -75,7 +75,80 @@ def generate_data(num_channels=1, config=None):
     return data_list
 
 def convert(data, type_=np.uint8):
+    if np.dtype(type_) == np.uint8:
+        return Image.fromarray(to_uint8(data))
     data_flipped = np.flipud(data)
     arr_norm = (data_flipped - data_flipped.min()) / (data_flipped.max() - data_flipped.min() + 1e-9)
     arr_typed = (arr_norm * 255).astype(type_)
-    return Image.fromarray(arr_typed)
\ No newline at end of file
+    return Image.fromarray(arr_typed)
+
+def to_uint8(data, out=None, flip=True, limits=None):
+    # min-max scaled uint8 for display and mask scripts only, flipped like convert by default
+    # pass the previous result as out to reuse its buffer frame after frame, and (lo, hi) as limits
+    # to scale to e.g. AutoContrast limits instead, values outside them saturate
+    data = np.asarray(data)
+    if flip:
+        data = data[::-1]
+    lo, hi = (np.min(data), np.max(data)) if limits is None else limits
+    scaled = np.subtract(data, lo, dtype=np.float32)
+    scaled *= np.float32(255.0 / (hi - lo + 1e-9))
+    if limits is not None:
+        np.clip(scaled, 0, 255, out=scaled)
+    if out is None or out.shape != scaled.shape:
+        out = np.empty(scaled.shape, dtype=np.uint8)
+    np.copyto(out, scaled, casting='unsafe')
+    return out
+
+def block_mean(data, factor):
+    # mean of every factor x factor block of a 2d array whose sides are multiples of factor
+    if factor == 1:
+        return data
+    h, w = data.shape
+    return data.reshape(h // factor, factor, w // factor, factor).mean(axis=(1, 3), dtype=np.float32)
+
+class FrameData(list):
+    # one float32 (y, x) plane per ai channel in volts, in scan orientation, plus the metadata to interpret it
+    # it is a list, so everything that used to take a list of channels still does
+    def __init__(self, planes, metadata=None):
+        super().__init__(planes)
+        self.metadata = dict(metadata or {})
+
+CONTRAST_PERCENTILES = (0.5, 99.5)
+CONTRAST_SAMPLES = 1 << 12  # pixels the percentiles are estimated from, whatever the frame size
+
+def robust_limits(data, percentiles=CONTRAST_PERCENTILES, samples=CONTRAST_SAMPLES):
+    # (lo, hi) display limits from a strided subsample, so single hot pixels can't set the range
+    # a fixed sample count keeps this at tens of microseconds even where a full min/max takes milliseconds
+    data = np.asarray(data)
+    step = max(1, int(np.sqrt(data.size / samples)))
+    sub = (data[::step, ::step] if data.ndim == 2 else data.ravel()[::step * step]).ravel()
+    ranks = [int(round(p / 100.0 * (sub.size - 1))) for p in percentiles]
+    part = np.partition(sub, ranks)  # a copy, data itself is never reordered
+    lo, hi = part[ranks[0]], part[ranks[1]]
+    if hi <= lo:
+        lo, hi = sub.min(), sub.max()  # flat frame, e.g. no signal on this channel
+    return float(lo), float(hi)
+
+class AutoContrast:
+    # percentile display limits per channel, smoothed from frame to frame so the live view doesn't flicker
+    # a jump bigger than the current range (new sample, gain change) is taken at once instead of faded into
+    def __init__(self, smoothing=0.3, percentiles=CONTRAST_PERCENTILES, samples=CONTRAST_SAMPLES):
+        self.smoothing = smoothing  # weight of the newest frame, 1 = no smoothing
+        self.percentiles = percentiles
+        self.samples = samples
+        self.limits = {}
+
+    def __call__(self, key, data):
+        lo, hi = robust_limits(data, self.percentiles, self.samples)
+        key = (key, np.shape(data))
+        prev = self.limits.get(key)
+        if prev is not None:
+            span = prev[1] - prev[0]
+            if abs(lo - prev[0]) + abs(hi - prev[1]) <= span:
+                lo = prev[0] + self.smoothing * (lo - prev[0])
+                hi = prev[1] + self.smoothing * (hi - prev[1])
+        self.limits[key] = (lo, hi)
+        return lo, hi
+
+    def reset(self):
+        self.limits.clear()
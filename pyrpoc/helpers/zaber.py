@@ -28,12 +28,18 @@ class ZaberStage:
             print("Homing the stage...")
             self.axis.home()
 
-    def move_absolute_um(self, position_um):
+    def move_absolute_um(self, position_um, wait=True):
+        # wait=False only issues the move, call wait_until_idle() before relying on the position
         if self.axis is None:
             self.connect()
         position_mm = position_um * 1e-3
-        self.axis.move_absolute(position_mm, Units.LENGTH_MILLIMETRES)
-        self.axis.wait_until_idle()
+        self.axis.move_absolute(position_mm, Units.LENGTH_MILLIMETRES, wait_until_idle=False)
+        if wait:
+            self.axis.wait_until_idle()
+
+    def wait_until_idle(self):
+        if self.axis is not None:
+            self.axis.wait_until_idle()
 
     def is_connected(self):
         return (self.connection is not None)
@@ -1,13 +1,27 @@
 import os
+import time
 from tkinter import messagebox
-from pyrpoc.helpers.utils import generate_data, convert
-from pyrpoc.mains.display import display_data
-from pyrpoc.helpers.galvo_funcs import Galvo
-from pyrpoc.helpers.run_image_2d import run_scan
+import json
+from pyrpoc.helpers.utils import FrameData
+from pyrpoc.mains.display import request_display, get_mailbox
+from pyrpoc.helpers.galvo_funcs import GALVO_DEFAULTS, preview_config
+from pyrpoc.helpers.run_image_2d import run_scan, ScanSession
+from pyrpoc.helpers.scan_plan import get_plan
+from pyrpoc.helpers.frame_pipeline import FramePipeline
+from pyrpoc.helpers.stack_scheduler import StackScheduler
+from pyrpoc.helpers.mask_predictor import MaskPredictor, MaskScriptError, run_mask_scripts
+from pyrpoc.helpers.scan_planner import scan_throughput
+from pyrpoc.helpers.fake_daq import FakeDAQ
+from pyrpoc.helpers.raw_recorder import RawRecorder
 import pyrpoc.helpers.prior_stage.functions as prior
 from PIL import Image
 import numpy as np
 
+# scan parameters whose edits switch continuous acquisition to coarse preview frames
+PREVIEW_KEYS = ('amp_x', 'amp_y', 'offset_x', 'offset_y')
+PREVIEW_FACTOR = 4
+PREVIEW_IDLE = 1.0  # seconds without edits before going back to full resolution
+
 def reset_gui(gui):
     gui.running = False
     gui.acquiring = False
@@ -16,16 +30,226 @@ def reset_gui(gui):
     gui.stop_button['state'] = 'disabled'
     gui.progress_label.config(text='(0/0)')
 
+def get_scan_session(gui):
+    # one session per gui, so the daq tasks survive between frames and between acquisitions
+    # simulation mode runs the exact same session on a simulated daq instead of skipping it
+    simulated = gui.simulation_mode.get()
+    attr = 'sim_session' if simulated else 'scan_session'
+    session = getattr(gui, attr, None)
+    if session is None:
+        session = ScanSession(backend=FakeDAQ(modulation_depth=0.5) if simulated else None)
+        setattr(gui, attr, session)
+    return session
+
+def stream_block_rows(galvo, period=0.05):
+    # enough rows per callback for roughly one display update every `period` seconds
+    row_time = galvo.total_x * galvo.pixel_samples / galvo.rate
+    return max(1, int(period / row_time))
+
+def stream_to_display(gui, min_interval=0.1):
+    # partial frames arrive on the daq callback thread, only hand a copy to tk every min_interval seconds
+    last_push = [0.0]
+    def on_rows(frame, rows_done):
+        now = time.perf_counter()
+        if rows_done >= frame.shape[1] or now - last_push[0] < min_interval:
+            return
+        last_push[0] = now
+        request_display(gui, [ch.copy() for ch in frame])
+    return on_rows
+
+def get_mask_predictor(gui):
+    predictor = getattr(gui, 'mask_predictor', None)
+    if predictor is None:
+        predictor = MaskPredictor()
+        gui.mask_predictor = predictor
+    return predictor
+
+def predictive_mask_settings(gui):
+    # (max_stale, refresh_every) when predictive script masks are enabled in the gui, otherwise None
+    predictive_var = getattr(gui, 'predictive_mask_var', None)
+    if predictive_var is None or not predictive_var.get():
+        return None
+    max_stale = int(gui.mask_max_stale_var.get())
+    refresh_every = int(gui.mask_refresh_var.get())
+    if max_stale < 1 or refresh_every < 0:
+        raise ValueError('Max stale frames must be at least 1 and the refresh interval at least 0.')
+    return max_stale, refresh_every
+
+def mask_script_budget(gui):
+    # per-call budget of the mask script workers in seconds, None keeps their default
+    budget_var = getattr(gui, 'mask_budget_var', None)
+    if budget_var is None:
+        return None
+    budget_ms = float(budget_var.get())
+    if budget_ms <= 0:
+        raise ValueError('Script budget must be positive.')
+    return budget_ms * 1e-3
+
+def show_mask_stats(gui, scripts):
+    stats_var = getattr(gui, 'mask_stats_var', None)
+    if stats_var is None:
+        return
+    parts = []
+    for i, script in scripts.items():
+        if not hasattr(script, 'stats'):
+            continue
+        st = script.stats()
+        latency = f"{st['mean_ms']:.1f} ms (p95 {st['p95_ms']:.1f})" if st['mean_ms'] is not None else '-'
+        parts.append(f"{gui.mod_ttl_channel_vars[i].get()}: {latency}, {st['timeouts']} late, {st['errors']} errors")
+    text = ' | '.join(parts)
+    gui.root.after(0, stats_var.set, text)
+
+def burst_frames(gui):
+    # frames per hardware-timed burst, 1 = every frame is its own finite task
+    burst_var = getattr(gui, 'burst_frames_var', None)
+    if burst_var is None:
+        return 1
+    frames = int(burst_var.get())
+    if frames < 1:
+        raise ValueError('Burst frames must be at least 1.')
+    return frames
+
+def uses_mask_scripts(gui):
+    return hasattr(gui, 'mod_scripts') and any(
+        gui.mod_enabled_vars[i].get() and i in gui.mod_scripts
+        for i in range(len(gui.mod_enabled_vars))
+    )
+
+def static_masks(gui):
+    # (do channels, masks) of every enabled modulation channel with a loaded mask
+    mod_do_chans = []
+    mod_masks = []
+    if hasattr(gui, 'mod_enabled_vars') and hasattr(gui, 'mod_masks'):
+        for i, enabled_var in enumerate(gui.mod_enabled_vars):
+            if enabled_var.get() and i in gui.mod_masks:
+                mod_do_chans.append(gui.mod_ttl_channel_vars[i].get())
+                mod_masks.append(gui.mod_masks[i])
+    return mod_do_chans, mod_masks
+
+def burst_allowed(gui, force_no_mask=False):
+    # bursts repeat one set of masks in every frame, so per-frame script masks and variable dwell
+    # (frames of different lengths) still go frame by frame
+    if force_no_mask:
+        return True
+    if uses_mask_scripts(gui):
+        return False
+    return variable_dwell_multiplier(gui) is None or not static_masks(gui)[1]
+
+def variable_dwell_multiplier(gui):
+    # None unless variable dwell rpoc is selected in the gui
+    mode_var = getattr(gui, 'rpoc_mode_var', None)
+    if mode_var is None or mode_var.get() != 'variable':
+        return None
+    multiplier = float(gui.dwell_multiplier_var.get())
+    if multiplier < 1:
+        raise ValueError('Dwell multiplier must be at least 1.')
+    return multiplier
+
+def start_raw_recording(gui, filename):
+    # raw samples go next to the tiff, e.g. stack.tiff -> stack_raw.bin
+    record_var = getattr(gui, 'record_raw_var', None)
+    if record_var is None or not record_var.get():
+        return None
+    if variable_dwell_multiplier(gui) is not None and static_masks(gui)[1]:
+        print("[WARNING] Variable dwell frames have no fixed sample layout and are not raw recorded.")
+    recorder = RawRecorder(os.path.splitext(filename)[0] + '_raw.bin')
+    get_scan_session(gui).recorder = recorder
+    return recorder
+
+def stop_raw_recording(gui, recorder):
+    get_scan_session(gui).recorder = None
+    recorder.close()
+    stats = recorder.stats()
+    print(f"[INFO] Recorded {stats['frames']} raw frames to {recorder.path}.")
+
+def mark_param_edit(gui):
+    # called by the gui while scan area or focus are being adjusted, see preview_active
+    gui.last_param_edit = time.perf_counter()
+
+def preview_idle(gui):
+    idle_var = getattr(gui, 'preview_idle_var', None)
+    if idle_var is None:
+        return PREVIEW_IDLE
+    try:
+        return max(0.0, float(idle_var.get()))
+    except ValueError:
+        return PREVIEW_IDLE
+
+def preview_active(gui, continuous, save):
+    # coarse frames while amplitudes, offsets or focus change in continuous mode, full resolution again once
+    # nothing was edited for the idle period. never for saved data, and not with rpoc masks, which are
+    # drawn for the full resolution grid
+    preview_var = getattr(gui, 'preview_var', None)
+    if not continuous or save or preview_var is None or not preview_var.get():
+        return False
+    if static_masks(gui)[0] or uses_mask_scripts(gui):
+        return False
+    snapshot = tuple(gui.config[key] for key in PREVIEW_KEYS)
+    previous = getattr(gui, 'preview_snapshot', None)
+    gui.preview_snapshot = snapshot
+    if previous is not None and snapshot != previous:
+        mark_param_edit(gui)
+    last_edit = getattr(gui, 'last_param_edit', None)
+    return last_edit is not None and time.perf_counter() - last_edit < preview_idle(gui)
+
+def pipeline_policy(continuous, save):
+    # display-only continuous scanning never waits on the host, anything that gets saved is never dropped
+    return 'drop' if continuous and not save else 'block'
+
+def channel_names(gui, n_channels):
+    names = []
+    for i in range(n_channels):
+        if 'channel_names' in gui.config and i < len(gui.config['channel_names']):
+            names.append(gui.config['channel_names'][i])
+        elif i < len(gui.config['ai_chans']):
+            names.append(gui.config['ai_chans'][i])
+        else:
+            names.append(f"chan{i}")
+    return names
+
+def frame_metadata(gui, galvo=None, **extra):
+    # what is needed to interpret the float32 planes later, saved with every tiff
+    if galvo is not None:
+        scan = {key: getattr(galvo, key) for key in GALVO_DEFAULTS}
+        scan['pixel_samples'] = galvo.pixel_samples
+    else:
+        scan = {key: gui.config.get(key) for key in GALVO_DEFAULTS}
+    metadata = {
+        'units': 'V',
+        'channels': channel_names(gui, len(gui.config['ai_chans'])),
+        'time': time.time(),
+        'scan': scan,
+        'simulated': bool(gui.simulation_mode.get()),
+    }
+    metadata.update(extra)
+    return metadata
+
+def consume_frame(gui, pipeline, images, index, num_steps, data_list, metadata=None):
+    # runs on the pipeline thread while the daq is already scanning the next frame
+    images[index] = process_frame(gui, data_list, dict(metadata or {}, index=index))
+    dropped = pipeline.stats()['dropped']
+    text = f'({index + 1}/{num_steps})' if not dropped else f'({index + 1}/{num_steps}, {dropped} dropped)'
+    gui.root.after(0, lambda: gui.progress_label.config(text=text))
+
+def save_stack(gui, images, filename):
+    save_images(gui, [img for img in images if img is not None], filename)
+
 def acquire(gui, continuous=False, startup=False, auxilary=False, force_no_mask=False):
     if (gui.running or gui.acquiring) and not (startup or auxilary):
         return
 
     gui.running = continuous
     gui.acquiring = True
+    # predictions never carry over from a previous acquisition, e.g. the last mosaic tile
+    get_mask_predictor(gui).reset()
     gui.stop_button['state'] = 'normal'
     gui.continuous_button['state'] = 'disabled'
     gui.single_button['state'] = 'disabled'
 
+    pipeline = None
+    warned = None
+    shown_before = get_mailbox(gui).stats()
+    gui.preview_snapshot = None  # edits made while stopped don't start a preview
     try:
         while gui.running if continuous else True:
             gui.update_config()
@@ -83,40 +307,155 @@ def acquire(gui, continuous=False, startup=False, auxilary=False, force_no_mask=
                     messagebox.showerror("Prior Z-Stage Error", str(e))
                     break
 
-            images = []
-            for i in range(num_steps):
-                if not gui.acquiring:
-                    break
-
-                if hyperspectral:
-                    gui.zaber_stage.move_absolute_um(positions[i])
-                elif zscan:
-                    prior.move_z(port, int(positions[i]))
+            # compiled once per stack, every step scans the exact same raster
+            preview = preview_active(gui, continuous, save)
+            if preview:
+                scan_config = preview_config(gui.config, PREVIEW_FACTOR)
+            else:
+                scan_config = gui.config
+            plan = get_plan(scan_config)
+
+            # bursts compile their own full resolution plan, previews go frame by frame
+            burst = burst_frames(gui) if not (hyperspectral or zscan or preview) and burst_allowed(gui, force_no_mask) else 1
+            if continuous and not save:
+                num_steps = max(num_steps, burst)
+
+            # check the parameters before the first scan, e.g. an ai rate the board can't do
+            report = scan_throughput(scan_config, do_chans=static_masks(gui)[0], frames=burst)
+            if report['warnings'] != warned:
+                for warning in report['warnings']:
+                    print(f"[WARNING] {warning}")
+                warned = report['warnings']
+            if report['rate_warning'] is not None and not gui.simulation_mode.get():
+                messagebox.showerror('Scan Parameters', f"{report['rate_warning']}\nLower the sampling rate or use fewer input channels.")
+                break
 
-                galvo = Galvo(gui.config)
-                data = acquire_single(gui, channels, galvo, force_no_mask=force_no_mask)
-                if data is None:
-                    break
+            # the daq thread only scans, conversion/display/saving happen on the pipeline thread
+            policy = pipeline_policy(continuous, save)
+            if pipeline is None or pipeline.policy != policy:
+                if pipeline is not None:
+                    pipeline.close()
+                pipeline = FramePipeline(lambda job: job(), depth=2, policy=policy, name='acquisition')
 
-                images.append(data)
-                gui.progress_label.config(text=f'({i + 1}/{num_steps})')
-                gui.root.update_idletasks()
+            # the next move starts as soon as a scan has its samples, scans only wait on motion completion
+            scheduler = None
+            if hyperspectral:
+                scheduler = StackScheduler(lambda pos: gui.zaber_stage.move_absolute_um(pos, wait=False), gui.zaber_stage.wait_until_idle, positions)
+            elif zscan:
+                scheduler = StackScheduler(lambda pos: prior.move_z(port, int(pos), wait=False), prior.wait_for_motion, positions)
 
-            if save and images:
-                save_images(gui, images, filename)
+            images = [None] * num_steps
+            metadata = frame_metadata(gui, plan.galvo, positions=positions if (hyperspectral or zscan) else None)
+            recorder = start_raw_recording(gui, filename) if save else None
+            try:
+                if burst > 1:
+                    # time series without stage moves, hardware-timed bursts instead of one task per frame
+                    i = 0
+                    while i < num_steps and gui.acquiring:
+                        frames = min(burst, num_steps - i)
+                        # jobs can run after the next stack has started, so they bind this stack's lists now
+                        def on_frame(idx, data_list, start=i, images=images, metadata=metadata):
+                            pipeline.put(lambda idx=start + idx, data_list=data_list, images=images, metadata=metadata: consume_frame(gui, pipeline, images, idx, num_steps, data_list, metadata))
+                        if acquire_burst(gui, channels, frames, on_frame, force_no_mask=force_no_mask) is None:
+                            break
+                        i += frames
+                else:
+                    for i in range(num_steps):
+                        if not gui.acquiring:
+                            break
+
+                        on_acquired = None
+                        if scheduler is not None:
+                            scheduler.wait_ready(i)
+                            on_acquired = lambda i=i: scheduler.advance(i)
+
+                        data_list = scan_frame(gui, channels, plan.galvo, force_no_mask=force_no_mask, on_acquired=on_acquired)
+                        if data_list is None:
+                            break
+
+                        pipeline.put(lambda i=i, data_list=data_list, images=images, metadata=metadata: consume_frame(gui, pipeline, images, i, num_steps, data_list, metadata))
+            finally:
+                if scheduler is not None:
+                    scheduler.finish()
+                if recorder is not None:
+                    stop_raw_recording(gui, recorder)
+
+            if save:
+                # queued behind this stack's frames, so the next stack can start scanning while it writes
+                pipeline.put(lambda images=images, filename=filename: save_stack(gui, images, filename))
 
             if not continuous:
                 break
 
+        if pipeline is not None:
+            pipeline.close()
+
     except Exception as e:
+        if pipeline is not None:
+            try:
+                pipeline.close(discard=True)
+            except Exception:
+                pass  # already reporting the first error
         reset_gui(gui)
         messagebox.showerror('Acquisition Error', f'Unexpected error:\n{e}')
     finally:
+        if pipeline is not None:
+            stats = pipeline.stats()
+            if stats['dropped']:
+                print(f"[INFO] Dropped {stats['dropped']} of {stats['produced']} frames on the host side, the scanner kept running at full rate.")
+        shown = get_mailbox(gui).stats()
+        skipped = shown['dropped'] - shown_before['dropped']
+        if skipped:
+            print(f"[INFO] Display skipped {skipped} of {shown['posted'] - shown_before['posted']} frames it couldn't keep up with, "
+                  f"they were still processed.")
         if not auxilary:
             reset_gui(gui)
 
 
 def acquire_single(gui, channels, galvo, move_z=None, force_no_mask=False):
+    data_list = scan_frame(gui, channels, galvo, move_z=move_z, force_no_mask=force_no_mask)
+    if data_list is None:
+        return None
+    return process_frame(gui, data_list, frame_metadata(gui, galvo))
+
+
+def process_frame(gui, data_list, metadata=None):
+    # frames stay float32 volts end to end, uint8 only ever exists for display (see to_uint8)
+    frame = FrameData([np.asarray(d, dtype=np.float32) for d in data_list], metadata)
+    # set here rather than on display, the display may skip frames but callers (autofocus, mosaic) read the latest
+    gui.data = frame
+    request_display(gui, frame)
+    return frame
+
+
+def acquire_burst(gui, channels, frames, on_frame, force_no_mask=False):
+    # `frames` frames back to back in one hardware-timed task, on_frame(index, data_list) gets every frame
+    # as soon as it is reduced, on the calling thread. None if the burst failed, like scan_frame
+    try:
+        mod_do_chans, mod_masks = ([], []) if force_no_mask else static_masks(gui)
+        plan = get_plan(gui.config, frames=frames)
+        result = run_scan(
+            ai_channels=channels,
+            galvo=plan.galvo,
+            modulate=bool(mod_do_chans),
+            mod_do_chans=mod_do_chans,
+            mod_masks=mod_masks,
+            session=get_scan_session(gui),
+            on_frame=on_frame,
+        )
+        if plan.frames == 1:
+            on_frame(0, result)
+        return True
+
+    except Exception as e:
+        reset_gui(gui)
+        messagebox.showerror('Acquisition Error', f'Error acquiring burst: {e}')
+        return None
+
+
+def scan_frame(gui, channels, galvo, move_z=None, force_no_mask=False, on_acquired=None):
+    # daq side of a frame, returns the reduced channel images without touching the display
+    # on_acquired() fires once the final scan of the frame has its samples
     if move_z is not None:
         try:
             gui.zaber_stage.move_absolute_um(move_z)
@@ -126,42 +465,46 @@ def acquire_single(gui, channels, galvo, move_z=None, force_no_mask=False):
             return None
 
     try:
-        if gui.simulation_mode.get(): # :)
-            data_list = generate_data(len(channels), config=gui.config)
-            gui.root.after(0, display_data, gui, data_list)
-            return [convert(d) for d in data_list]
-        
-
-    
-        use_dynamic_mask = hasattr(gui, 'mod_scripts') and any(
-            gui.mod_enabled_vars[i].get() and i in gui.mod_scripts
-            for i in range(len(gui.mod_enabled_vars))
-        )
+        use_dynamic_mask = uses_mask_scripts(gui)
         if force_no_mask: 
             use_dynamic_mask = False
         mod_do_chans = []
         mod_masks = []
 
+        predictive = None
         if use_dynamic_mask:
-            data_list = run_scan(
-                ai_channels=channels,
-                galvo=galvo,
-                modulate=False,
-            )
-            converted = np.asarray([convert(d) for d in data_list])
+            scripts = {
+                i: gui.mod_scripts[i] for i, enabled_var in enumerate(gui.mod_enabled_vars)
+                if enabled_var.get() and i in gui.mod_scripts
+            }
+            shape = (galvo.numsteps_y, galvo.numsteps_x)
+            predictor = get_mask_predictor(gui)
+            predictive = predictive_mask_settings(gui)
+            budget = mask_script_budget(gui)
+            predictor.begin_frame()
 
-            # process the first acquisition
-            for i, enabled_var in enumerate(gui.mod_enabled_vars): 
-                if enabled_var.get() and i in gui.mod_scripts:
-                    try:
-                        mask_array = gui.mod_scripts[i](converted)
-                        if mask_array.shape != converted[0].shape:
-                            raise ValueError(f"Returned mask is the wrong size relative to input imgae shape. Input shape: {converted[0].shape}, mask shape: {mask_array.shape}")
-                        gui.mod_masks[i] = Image.fromarray(mask_array.astype(np.uint8) * 255)
-                    except Exception as e:
-                        print(f"[ERROR] Mask script failed for channel {gui.mod_ttl_channel_vars[i].get()}: {e}")
-                        messagebox.showerror('Auto-Mask Error', f'Error in mask creation on  {gui.mod_ttl_channel_vars[i].get()}: {e}')
-                        return None
+            try:
+                # predictive mode reuses the masks computed from the previous frame while they are fresh enough
+                masks = predictor.next_masks(scripts, shape, *predictive) if predictive else None
+                if masks is None:
+                    # unmodulated scan first, its masks modulate the second (real) scan of this frame
+                    data_list = run_scan(
+                        ai_channels=channels,
+                        galvo=galvo,
+                        modulate=False,
+                        session=get_scan_session(gui),
+                    )
+                    masks = run_mask_scripts(scripts, data_list, budget)
+                    predictor.store(scripts, shape, masks)
+            except MaskScriptError as e:
+                chan = gui.mod_ttl_channel_vars[e.index].get()
+                print(f"[ERROR] Mask script failed for channel {chan}: {e}")
+                messagebox.showerror('Auto-Mask Error', f'Error in mask creation on  {chan}: {e}')
+                return None
+
+            for i, mask_array in masks.items():
+                gui.mod_masks[i] = Image.fromarray(mask_array.astype(np.uint8) * 255)
+            show_mask_stats(gui, scripts)
 
             # load the processing as the preset masks for the second (real) acquisition
             for i, enabled_var in enumerate(gui.mod_enabled_vars): 
@@ -178,16 +521,28 @@ def acquire_single(gui, channels, galvo, move_z=None, force_no_mask=False):
                         mod_do_chans.append(ttl_var)
                         mod_masks.append(gui.mod_masks[i])
 
+        multiplier = variable_dwell_multiplier(gui) if mod_masks else None
+        if multiplier is not None:
+            # masked pixels get the longer dwell, everything else keeps the normal one
+            galvo = get_plan(gui.config, mod_masks, dwell_multiplier=multiplier).galvo
+
+        stream_var = getattr(gui, 'stream_rows_var', None)
+        streaming = stream_var is not None and stream_var.get()
         data_list = run_scan(
             ai_channels=channels,
             galvo=galvo,
             modulate=bool(mod_do_chans),
             mod_do_chans=mod_do_chans,
             mod_masks=mod_masks,
+            session=get_scan_session(gui),
+            on_rows=stream_to_display(gui) if streaming else None,
+            rows_per_block=stream_block_rows(galvo) if streaming else None,
+            on_acquired=on_acquired,
         )
-
-        gui.root.after(0, display_data, gui, data_list)
-        return [convert(d) for d in data_list]
+        if predictive:
+            # next frame's masks are computed from this one while the pipeline handles it and the next scan runs
+            predictor.submit(scripts, shape, data_list, budget)
+        return data_list
 
        
 
@@ -208,17 +563,21 @@ def save_images(gui, images, filename):
     base, ext = os.path.splitext(filename)
     num_channels = len(images[0])
     saved_fnames = []
+    names = channel_names(gui, num_channels)
+
+    # 32 bit float tiffs keep the absolute intensities, flipped to the orientation saved files always had
+    metadata = dict(getattr(images[0], 'metadata', {}), frames=len(images))
+    metadata.pop('index', None)
 
     for ch_idx in range(num_channels):
-        channel_frames = [frame[ch_idx] for frame in images]
+        channel_frames = [
+            Image.fromarray(np.ascontiguousarray(np.flipud(frame[ch_idx]), dtype=np.float32))
+            for frame in images
+        ]
         counter = 1
-
-        if 'channel_names' in gui.config and ch_idx < len(gui.config['channel_names']):
-            channel_suffix = gui.config['channel_names'][ch_idx]
-        elif ch_idx < len(gui.config['ai_chans']):
-            channel_suffix = gui.config['ai_chans'][ch_idx]
-        else:
-            channel_suffix = f"chan{ch_idx}"
+        channel_suffix = names[ch_idx]
+        # numpy scalars in the scan config are written as plain numbers
+        description = json.dumps(dict(metadata, channel=channel_suffix), default=lambda v: v.item() if hasattr(v, 'item') else str(v))
 
         new_filename = f"{base}_{channel_suffix}{ext}"
         while os.path.exists(new_filename):
@@ -230,10 +589,11 @@ def save_images(gui, images, filename):
                 new_filename,
                 save_all=True,
                 append_images=channel_frames[1:],
-                format='TIFF'
+                format='TIFF',
+                tiffinfo={270: description}
             )
         else:
-            channel_frames[0].save(new_filename, format='TIFF')
+            channel_frames[0].save(new_filename, format='TIFF', tiffinfo={270: description})
 
         saved_fnames.append(new_filename)
 
@@ -1,11 +1,280 @@
 import numpy as np
 import math
+import threading
+import time
 import tkinter as tk
+from contextlib import contextmanager
+from matplotlib.figure import Figure
 from mpl_toolkits.axes_grid1 import make_axes_locatable
 from matplotlib.colors import ListedColormap
 from PIL import Image
+from pyrpoc.helpers.utils import AutoContrast, block_mean
+from pyrpoc.helpers.frame_mailbox import FrameMailbox, DISPLAY_FPS, poll_interval
+
+class BlitDisplay:
+    # texture-style live view: the static figure (axes, ticks, titles) is rendered once and cached,
+    # every frame only redraws the image, crosshairs, slice lines, colorbars and overlays on top of it
+    # without fast display only the crosshairs and slice lines are animated, so clicks still never redraw images
+    def __init__(self, gui):
+        self.gui = gui
+        self.background = None
+        self.axes_backgrounds = {}
+        self.artists = []
+        self.layout = None
+        self.view = None
+        # full redraws (resize, toolbar zoom/pan) recapture the background
+        self.cid = gui.canvas.mpl_connect('draw_event', self.on_draw)
+        gui.fig.blitter = self
+
+    def on_draw(self, event):
+        # savefig draws the figure too, through its own canvas or a renderer at the file's resolution,
+        # neither of which is the screen background
+        canvas = self.gui.canvas
+        if event.canvas is not canvas or canvas.is_saving():
+            return
+        self.background = canvas.copy_from_bbox(self.gui.fig.bbox)
+        # per axes copies as well, so a single channel can be restored without touching the others
+        self.axes_backgrounds = {ax: canvas.copy_from_bbox(ax.bbox) for ax in self.gui.fig.axes}
+        self.view = self.view_limits()
+        self.draw_artists()
+
+    def view_limits(self):
+        return tuple(tuple(ax.viewLim.bounds) for ax in self.gui.fig.axes)
+
+    def draw_artists(self):
+        for artist in self.artists:
+            self.gui.fig.draw_artist(artist)
+
+    def set_artists(self, artists):
+        # artists that stop being animated go back into the cached background on the next full draw
+        for artist in self.artists:
+            if not any(artist is a for a in artists):
+                artist.set_animated(False)
+        for artist in artists:
+            artist.set_animated(True)
+        self.artists = artists
+
+    def update(self, artists, layout):
+        self.set_artists(artists)
+        if layout != self.layout:
+            # new geometry, channels or titles, the cached background is stale
+            self.layout = layout
+            self.gui.canvas.draw()
+            return
+        self.refresh()
+
+    def refresh(self, artists=None, axes=None):
+        # redraws only the animated artists, or only those of `artists` that sit inside `axes`,
+        # e.g. one channel's crosshair and slices after a click
+        if self.background is None or self.view_limits() != self.view or any(ax not in self.axes_backgrounds for ax in axes or ()):
+            self.gui.canvas.draw()
+            return
+        canvas = self.gui.canvas
+        if axes is None:
+            canvas.restore_region(self.background)
+            self.draw_artists()
+            canvas.blit(self.gui.fig.bbox)
+            return
+        for ax in axes:
+            canvas.restore_region(self.axes_backgrounds[ax])
+        for artist in self.artists:
+            if any(artist is a for a in artists):
+                self.gui.fig.draw_artist(artist)
+        for ax in axes:
+            canvas.blit(ax.bbox)
+
+    @contextmanager
+    def static(self):
+        # saved figures are drawn from scratch, where animated artists would be left out
+        animated = [artist for artist in self.artists if artist.get_animated()]
+        for artist in animated:
+            artist.set_animated(False)
+        try:
+            yield
+        finally:
+            for artist in animated:
+                artist.set_animated(True)
+            # the screen renderer may have been drawn into by the save, so recapture the background
+            self.gui.canvas.draw_idle()
+
+    def reset(self):
+        self.set_artists([])
+        self.background = None
+        self.axes_backgrounds = {}
+        self.layout = None
+
+
+class LiveFigure(Figure):
+    # the live view figure, saving it (e.g. from the toolbar) includes whatever its blitter animates
+    def savefig(self, *args, **kwargs):
+        blitter = getattr(self, 'blitter', None)
+        if blitter is None:
+            return super().savefig(*args, **kwargs)
+        with blitter.static():
+            return super().savefig(*args, **kwargs)
+
+
+def get_blitter(gui):
+    blitter = getattr(gui, 'blitter', None)
+    if blitter is None:
+        blitter = gui.blitter = BlitDisplay(gui)
+    return blitter
+
+
+def get_contrast(gui):
+    contrast = getattr(gui, 'contrast', None)
+    if contrast is None:
+        contrast = gui.contrast = AutoContrast()
+    return contrast
+
+
+def axis_extents(gui, nx, ny):
+    x_extent = np.linspace(
+        gui.config['offset_x'] - gui.config['amp_x'],
+        gui.config['offset_x'] + gui.config['amp_x'],
+        nx
+    )
+    y_extent = np.linspace(
+        gui.config['offset_y'] + gui.config['amp_y'],
+        gui.config['offset_y'] - gui.config['amp_y'],
+        ny
+    )
+    return x_extent, y_extent
+
+
+def screen_view(ax, data, extent):
+    # (image, extent) actually handed to matplotlib: the part of data inside the current view, block-mean
+    # downsampled to about the axes' size on screen, so a 4k scan costs no more to draw than a 512 one
+    # and zooming in far enough shows full resolution crops
+    ny, nx = data.shape
+    x0, x1, y_bottom, y_top = extent
+    cols = sorted((np.asarray(ax.get_xlim(), dtype=float) - x0) / (x1 - x0) * nx)
+    rows = sorted((np.asarray(ax.get_ylim(), dtype=float) - y_top) / (y_bottom - y_top) * ny)
+    c0, c1 = max(0, int(np.floor(cols[0]))), min(nx, int(np.ceil(cols[1])))
+    r0, r1 = max(0, int(np.floor(rows[0]))), min(ny, int(np.ceil(rows[1])))
+    if c1 <= c0 or r1 <= r0:
+        c0, c1, r0, r1 = 0, nx, 0, ny  # panned off the image
+    factor = max(1, int(min((c1 - c0) / max(ax.bbox.width, 1), (r1 - r0) / max(ax.bbox.height, 1))))
+    if factor > 1:
+        # whole blocks only, the last few rows/columns of the view are left out
+        c1 = c0 + (c1 - c0) // factor * factor
+        r1 = r0 + (r1 - r0) // factor * factor
+    view = block_mean(data[r0:r1, c0:c1], factor)
+    dx, dy = (x1 - x0) / nx, (y_bottom - y_top) / ny
+    return view, [x0 + c0 * dx, x0 + c1 * dx, y_top + r1 * dy, y_top + r0 * dy]
+
+
+def show_screen_view(ch_ax, data):
+    view, view_extent = screen_view(ch_ax["main"], data, ch_ax["extent"])
+    ch_ax["img_handle"].set_data(view)
+    ch_ax["img_handle"].set_extent(view_extent)
+
+
+def on_view_changed(gui, ch_ax):
+    # zoom/pan between frames, rebuild the visible part from the last shown frame
+    data_list = getattr(gui, 'shown_data', None)
+    if not data_list or ch_ax.get("index") is None or ch_ax["index"] >= len(data_list):
+        return
+    data = np.squeeze(data_list[ch_ax["index"]])
+    if data.ndim != 2:
+        return
+    show_screen_view(ch_ax, data)
+    gui.canvas.draw_idle()
+
+
+OVERLAY_COLORS = [
+    (1.0, 0.0, 0.0, 0.4), (0.0, 1.0, 0.0, 0.4), (0.0, 0.0, 1.0, 0.4),
+    (1.0, 1.0, 0.0, 0.4), (1.0, 0.0, 1.0, 0.4), (0.0, 1.0, 1.0, 0.4)
+]
+
+
+def mask_overlay(gui, nx, ny):
+    # (key, rgba) of every enabled mask composited into one layer, None without masks
+    # rebuilt only when a mask object is replaced, a channel is toggled or the scan size changes
+    enabled = [
+        (idx, gui.mod_masks[idx]) for idx, var in enumerate(getattr(gui, "mod_enabled_vars", []))
+        if var.get() and idx in gui.mod_masks
+    ]
+    if not enabled:
+        return None
+    # the cache holds the mask images themselves, so their ids can't be reused while the key is alive
+    key = (tuple((idx, id(mask)) for idx, mask in enabled), nx, ny)
+    cached = getattr(gui, "mask_overlay_cache", None)
+    if cached is not None and cached[0] == key:
+        return key, cached[1]
+
+    rgba = np.zeros((ny, nx, 4), dtype=np.float32)
+    for idx, mask_img in enabled:
+        mask_l = mask_img.convert('L')
+        if mask_l.size != (nx, ny):
+            mask_l = mask_l.resize((nx, ny), Image.NEAREST)
+        mask_arr = np.asarray(mask_l) > 0
+        color = np.asarray(OVERLAY_COLORS[idx % len(OVERLAY_COLORS)], dtype=np.float32)
+        # "over" compositing, the same result as stacking one overlay per mask
+        alpha = color[3]
+        under = rgba[mask_arr]
+        out_alpha = alpha + under[:, 3] * (1 - alpha)
+        under[:, :3] = (color[:3] * alpha + under[:, :3] * (under[:, 3:] * (1 - alpha))) / out_alpha[:, None]
+        under[:, 3] = out_alpha
+        rgba[mask_arr] = under
+    gui.mask_overlay_cache = (key, rgba, [mask for _, mask in enabled])
+    return key, rgba
+
+
+def fast_display(gui):
+    var = getattr(gui, 'fast_display_var', None)
+    return var is not None and var.get()
+
+
+_mailbox_lock = threading.Lock()
+
+
+def get_mailbox(gui):
+    with _mailbox_lock:
+        mailbox = getattr(gui, 'display_mailbox', None)
+        if mailbox is None:
+            mailbox = gui.display_mailbox = FrameMailbox()
+    return mailbox
+
+
+def display_max_fps(gui):
+    var = getattr(gui, 'display_fps_var', None)
+    if var is None:
+        return DISPLAY_FPS
+    try:
+        fps = float(var.get())
+    except (ValueError, tk.TclError):
+        return DISPLAY_FPS
+    return fps if fps > 0 else DISPLAY_FPS
+
+
+def request_display(gui, data_list):
+    # safe from any thread, the frame waits in the display mailbox for the next poll of the tk loop,
+    # frames arriving faster than the display refreshes replace each other instead of piling up
+    get_mailbox(gui).put(data_list)
+
+
+def start_display_polling(gui):
+    # polls the display mailbox on the tk loop for as long as the gui runs, at most display_max_fps(gui) times a second
+    mailbox = get_mailbox(gui)
+
+    def poll():
+        start = time.perf_counter()
+        data_list = mailbox.take()
+        if data_list is not None:
+            try:
+                display_data(gui, data_list)
+            except Exception as e:
+                print(f"[ERROR] Display update failed: {e}")
+        elapsed_ms = int((time.perf_counter() - start) * 1e3)
+        gui.root.after(max(1, poll_interval(display_max_fps(gui)) - elapsed_ms), poll)
+
+    gui.root.after(0, poll)
+
 
 def create_axes(gui, n_channels):
+    if getattr(gui, 'blitter', None) is not None:
+        gui.blitter.reset()
     gui.fig.clf()
     gui.fig.patch.set_facecolor('#1E1E1E')
     gui.channel_axes = []
@@ -56,33 +325,28 @@ def display_data(gui, data_list):
     if not gui.channel_axes or (len(gui.channel_axes) != n_channels):
         create_axes(gui, n_channels)
 
-    gui.data = data_list
+    gui.shown_data = data_list  # what the crosshair slices read, gui.data is the last acquired frame
+    layers = []
+    cursors = []
+    layout = [n_channels]
     for i, orig_data in enumerate(data_list):
         data = np.squeeze(orig_data) if orig_data.ndim > 2 else orig_data
 
         ch_ax = gui.channel_axes[i]
         ax_main = ch_ax["main"]
-        nx = gui.config["numsteps_x"]
-        ny = gui.config["numsteps_y"]
+        ny, nx = data.shape  # not the configured steps, preview frames are coarser
 
         if 'channel_names' in gui.config and i < len(gui.config['channel_names']):
             channel_name = gui.config['channel_names'][i]
         else:
             channel_name = gui.config['ai_chans'][i] if i < len(gui.config['ai_chans']) else f"chan{i}"
         ax_main.set_title(channel_name, fontsize=10, color='white')
+        layout.append((channel_name, data.shape))
 
-        x_extent = np.linspace(
-            gui.config['offset_x'] - gui.config['amp_x'],
-            gui.config['offset_x'] + gui.config['amp_x'],
-            nx
-        )
-        y_extent = np.linspace(
-            gui.config['offset_y'] + gui.config['amp_y'],
-            gui.config['offset_y'] - gui.config['amp_y'],
-            ny
-        )
+        x_extent, y_extent = axis_extents(gui, nx, ny)
 
         extent = [x_extent[0], x_extent[-1], y_extent[-1], y_extent[0]]
+        layout.append(tuple(extent))
         if ch_ax["img_handle"] is None:
             im = ax_main.imshow(
                 data,
@@ -92,6 +356,13 @@ def display_data(gui, data_list):
                 cmap=gui.grayred_cmap
             )
             ch_ax["img_handle"] = im
+            ch_ax["index"] = i
+            ch_ax["extent"] = extent
+            # fixed limits, so the view only changes through the toolbar or a new scan geometry
+            ax_main.set_xlim(extent[0], extent[1])
+            ax_main.set_ylim(extent[2], extent[3])
+            ax_main.callbacks.connect('xlim_changed', lambda ax, ch_ax=ch_ax: on_view_changed(gui, ch_ax))
+            ax_main.callbacks.connect('ylim_changed', lambda ax, ch_ax=ch_ax: on_view_changed(gui, ch_ax))
             gui.slice_x[i] = nx // 2
             gui.slice_y[i] = ny // 2
 
@@ -107,25 +378,25 @@ def display_data(gui, data_list):
             ch_ax["colorbar"] = cb
         else:
             im = ch_ax["img_handle"]
-            im.set_data(data)
-
-            auto_scale_var = gui.auto_colorbar_vars.get(channel_name, tk.BooleanVar(value=True))
-            auto_scale = auto_scale_var.get()
-            if auto_scale:
-                im.set_clim(vmin=data.min(), vmax=data.max())
-            else:
-                fixed_strvar = gui.fixed_colorbar_vars.get(channel_name, tk.StringVar(value=""))
-                try:
-                    fixed_max = float(fixed_strvar.get())
-                    if fixed_max < data.min():
-                        fixed_max = data.max()
-                    im.set_clim(vmin=data.min(), vmax=fixed_max)
-                except ValueError:
-                    im.set_clim(vmin=data.min(), vmax=data.max())
-
-            im.set_extent(extent)
-            ax_main.set_xlim(extent[0], extent[1])
-            ax_main.set_ylim(extent[2], extent[3])
+            if ch_ax["extent"] != extent:
+                # new scan geometry, an old zoom doesn't apply to it
+                ch_ax["extent"] = extent
+                ax_main.set_xlim(extent[0], extent[1])
+                ax_main.set_ylim(extent[2], extent[3])
+        show_screen_view(ch_ax, data)
+
+        # percentile limits from a subsample, smoothed over frames, instead of full-frame min/max
+        vmin, vmax = get_contrast(gui)(i, data)
+        auto_scale_var = gui.auto_colorbar_vars.get(channel_name, tk.BooleanVar(value=True))
+        if not auto_scale_var.get():
+            fixed_strvar = gui.fixed_colorbar_vars.get(channel_name, tk.StringVar(value=""))
+            try:
+                fixed_max = float(fixed_strvar.get())
+                if fixed_max > vmin:
+                    vmax = fixed_max
+            except ValueError:
+                pass
+        im.set_clim(vmin=vmin, vmax=vmax)
 
         sx = gui.slice_x[i] if gui.slice_x[i] is not None and gui.slice_x[i] < nx else nx // 2
         sy = gui.slice_y[i] if gui.slice_y[i] is not None and gui.slice_y[i] < ny else ny // 2
@@ -152,43 +423,35 @@ def display_data(gui, data_list):
         else:
             ch_ax["vslice_line"].set_data(data[:, sx], y_extent)
 
-        # overlays
+        # overlays, one persistent layer per channel that only changes when a mask or the scan size does
+        overlay = None
         if gui.show_mask_var.get() and hasattr(gui, "mod_masks") and not getattr(gui, "skip_overlays", False):
-            overlay_colors = [
-                (1.0, 0.0, 0.0, 0.4), (0.0, 1.0, 0.0, 0.4), (0.0, 0.0, 1.0, 0.4),
-                (1.0, 1.0, 0.0, 0.4), (1.0, 0.0, 1.0, 0.4), (0.0, 1.0, 1.0, 0.4)
-            ]
-            if "mask_handles" not in ch_ax:
-                ch_ax["mask_handles"] = []
-
-            for h in ch_ax["mask_handles"]:
+            overlay = mask_overlay(gui, nx, ny)
+        handles = ch_ax.get("mask_handles", [])
+        if overlay is None:
+            for h in handles:
                 h.remove()
             ch_ax["mask_handles"] = []
-
-            for idx, enabled_var in enumerate(getattr(gui, "mod_enabled_vars", [])):
-                if not enabled_var.get() or idx not in gui.mod_masks:
-                    continue
-                mask_img = gui.mod_masks[idx]
-                mask_arr = np.array(mask_img.convert('L')) > 0
-                if mask_arr.shape != (ny, nx):
-                    mask_arr = np.array(mask_img.resize((nx, ny), Image.NEAREST)) > 0
-                color = overlay_colors[idx % len(overlay_colors)]
-                rgba_mask = np.zeros((ny, nx, 4), dtype=np.float32)
-                rgba_mask[..., 0] = color[0] * mask_arr
-                rgba_mask[..., 1] = color[1] * mask_arr
-                rgba_mask[..., 2] = color[2] * mask_arr
-                rgba_mask[..., 3] = color[3] * mask_arr
-
-                overlay = ax_main.imshow(rgba_mask,
-                                         extent=[x_extent[0], x_extent[-1], y_extent[-1], y_extent[0]],
-                                         origin='upper', aspect='equal')
-                ch_ax["mask_handles"].append(overlay)
+            ch_ax["mask_key"] = None
         else:
-            for h in ch_ax.get("mask_handles", []):
-                h.remove()
-            ch_ax["mask_handles"] = []
-
-    gui.canvas.draw_idle()
+            key, rgba = overlay
+            if not handles:
+                ch_ax["mask_handles"] = [ax_main.imshow(rgba, extent=extent, origin='upper', aspect='equal')]
+            elif ch_ax.get("mask_key") != key:
+                handles[0].set_data(rgba)
+            ch_ax["mask_handles"][0].set_extent(extent)
+            ch_ax["mask_key"] = key
+
+        layers += [ch_ax["img_handle"], ch_ax["colorbar"].ax, *ch_ax["mask_handles"]]
+        cursors += [ch_ax["vline"], ch_ax["hline"], ch_ax["hslice_line"], ch_ax["vslice_line"]]
+
+    blitter = get_blitter(gui)
+    if fast_display(gui):
+        blitter.update(layers + cursors, tuple(layout))
+    else:
+        blitter.set_artists(cursors)
+        blitter.layout = None
+        gui.canvas.draw_idle()
 
 
 def on_image_click(gui, event):
@@ -199,32 +462,32 @@ def on_image_click(gui, event):
 
     for i, ch_ax in enumerate(gui.channel_axes):
         if event.inaxes == ch_ax["main"]:
-            data = gui.data[i]
+            data = gui.shown_data[i]
             if data.ndim > 2:
                 data = np.squeeze(data)
             ny, nx = data.shape
-            x_extent = np.linspace(
-                gui.config['offset_x'] - gui.config['amp_x'],
-                gui.config['offset_x'] + gui.config['amp_x'],
-                nx
-            )
-            y_extent = np.linspace(
-                gui.config['offset_y'] + gui.config['amp_y'],
-                gui.config['offset_y'] - gui.config['amp_y'],
-                ny
-            )
+            x_extent, y_extent = axis_extents(gui, nx, ny)
             new_sx = np.argmin(np.abs(x_extent - event.xdata))
             new_sy = np.argmin(np.abs(y_extent - event.ydata))
 
             gui.slice_x[i] = min(new_sx, nx-1)
             gui.slice_y[i] = min(new_sy, ny-1)
 
+            sx, sy = gui.slice_x[i], gui.slice_y[i]
             if ch_ax["vline"]:
-                ch_ax["vline"].set_xdata([x_extent[gui.slice_x[i]]])
+                ch_ax["vline"].set_xdata([x_extent[sx]])
             if ch_ax["hline"]:
-                ch_ax["hline"].set_ydata([y_extent[gui.slice_y[i]]])
-
-            display_data(gui, gui.data)
+                ch_ax["hline"].set_ydata([y_extent[sy]])
+
+            # only this channel's crosshair and slices move, images and overlays stay in the cached background
+            if ch_ax.get("hslice_line") is not None:
+                ch_ax["hslice_line"].set_data(x_extent, data[sy, :])
+            if ch_ax.get("vslice_line") is not None:
+                ch_ax["vslice_line"].set_data(data[:, sx], y_extent)
+            get_blitter(gui).refresh(
+                [ch_ax["img_handle"], *ch_ax.get("mask_handles", []), ch_ax["vline"], ch_ax["hline"],
+                 ch_ax.get("hslice_line"), ch_ax.get("vslice_line")],
+                [ch_ax["main"], ch_ax["hslice"], ch_ax["vslice"]])
             return
 
 def create_gray_red_cmap():
@@ -1,13 +1,11 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 import numpy as np
-from matplotlib.figure import Figure
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
 import threading, os
 from pathlib import Path
 from PIL import Image
 import sys
-import importlib.util
 
 from PyQt5.QtWidgets import QApplication
 from PyQt5.QtGui import QPalette, QColor
@@ -15,7 +13,10 @@ from PyQt5.QtCore import Qt
 
 from pyrpoc.helpers.zaber import ZaberStage
 from pyrpoc.helpers.widgets import CollapsiblePane, ScrollableFrame
-from pyrpoc.helpers.utils import Tooltip
+from pyrpoc.helpers.utils import Tooltip, to_uint8
+from pyrpoc.helpers.frame_mailbox import DISPLAY_FPS
+from pyrpoc.helpers.mask_workers import MaskScript
+from pyrpoc.helpers.scan_planner import scan_throughput, format_report
 from pyrpoc.mains import acquisition
 from pyrpoc.helpers.spectrum_analyzer import SpectrumAnalyzer
 from pyrpoc.mains import display
@@ -80,7 +81,9 @@ class GUI:
             'numsteps_y': 512,
             'extrasteps_left': 200,
             'extrasteps_right': 20,
-            'dwell': 2.5e-6
+            'dwell': 2.5e-6,
+            'settle_samples': 0,
+            'bidirectional': False
         }
         self.param_entries = {}
 
@@ -133,6 +136,7 @@ class GUI:
                         arrowcolor="#888888")
 
         self.create_widgets()
+        display.start_display_polling(self)
 
         self.root.after(100, lambda: self.paned.sashpos(0, 450))
         self.update_sidebar_visibility()
@@ -258,6 +262,37 @@ class GUI:
         )
         self.simulation_mode_checkbutton.grid(row=0, column=1, padx=0, sticky='w')
 
+        self.stream_rows_var = tk.BooleanVar(value=False)
+        self.stream_rows_checkbutton = ttk.Checkbutton(
+            self.checkbox_frame, text='Stream Rows',
+            variable=self.stream_rows_var
+        )
+        self.stream_rows_checkbutton.grid(row=1, column=0, padx=0, sticky='w')
+
+        # unscaled samples of every saved frame, for reprocessing with a different pixel estimator later
+        self.record_raw_var = tk.BooleanVar(value=False)
+        self.record_raw_checkbutton = ttk.Checkbutton(
+            self.checkbox_frame, text='Record Raw',
+            variable=self.record_raw_var
+        )
+        self.record_raw_checkbutton.grid(row=1, column=1, padx=0, sticky='w')
+
+        # blitted live view, only the image layers are redrawn per frame on top of a cached figure
+        self.fast_display_var = tk.BooleanVar(value=False)
+        self.fast_display_checkbutton = ttk.Checkbutton(
+            self.checkbox_frame, text='Fast Display',
+            variable=self.fast_display_var
+        )
+        self.fast_display_checkbutton.grid(row=2, column=0, padx=0, sticky='w')
+
+        # continuous frames drop to a coarse grid while amplitudes, offsets or focus are being changed
+        self.preview_var = tk.BooleanVar(value=False)
+        self.preview_checkbutton = ttk.Checkbutton(
+            self.checkbox_frame, text='Preview Edits',
+            variable=self.preview_var
+        )
+        self.preview_checkbutton.grid(row=2, column=1, padx=0, sticky='w')
+
         self.io_frame = ttk.Frame(self.control_frame)
         self.io_frame.grid(row=2, column=0, columnspan=3, pady=(5, 5), sticky='ew')
         self.io_frame.columnconfigure(0, weight=0)
@@ -272,6 +307,21 @@ class GUI:
         self.progress_label = ttk.Label(self.io_frame, text='(0/0)', font=('Calibri', 12, 'bold'))
         self.progress_label.grid(row=0, column=2, padx=5)
 
+        # frames per hardware-timed burst for time series without stage moves, 1 = one task per frame
+        ttk.Label(self.io_frame, text='Burst frames').grid(row=1, column=0, sticky='w', padx=(5, 0))
+        self.burst_frames_var = tk.StringVar(value='1')
+        ttk.Entry(self.io_frame, textvariable=self.burst_frames_var, width=8).grid(row=1, column=1, sticky='w', padx=(5, 5))
+
+        # the live view redraws at most this often, faster frames are still processed and saved but not drawn
+        ttk.Label(self.io_frame, text='Display FPS').grid(row=2, column=0, sticky='w', padx=(5, 0))
+        self.display_fps_var = tk.StringVar(value=str(DISPLAY_FPS))
+        ttk.Entry(self.io_frame, textvariable=self.display_fps_var, width=8).grid(row=2, column=1, sticky='w', padx=(5, 5))
+
+        # seconds without edits before a preview goes back to full resolution
+        ttk.Label(self.io_frame, text='Preview idle (s)').grid(row=3, column=0, sticky='w', padx=(5, 0))
+        self.preview_idle_var = tk.StringVar(value=str(acquisition.PREVIEW_IDLE))
+        ttk.Entry(self.io_frame, textvariable=self.preview_idle_var, width=8).grid(row=3, column=1, sticky='w', padx=(5, 5))
+
         self.path_frame = ttk.Frame(self.control_frame)
         self.path_frame.grid(row=3, column=0, columnspan=3, pady=(5, 5), sticky='ew')
         self.path_frame.columnconfigure(0, weight=1)
@@ -297,7 +347,7 @@ class GUI:
             ('Offset X', 'offset_x'), ('Offset Y', 'offset_y'),
             ('AO Chans', 'ao_chans'), ('Steps X', 'numsteps_x'), ('Steps Y', 'numsteps_y'),
             ('Extra Steps Left', 'extrasteps_left'), ('Extra Steps Right', 'extrasteps_right'),
-            ('Sampling Rate (Hz)', 'rate'), ('Dwell Time (us)', 'dwell')
+            ('Sampling Rate (Hz)', 'rate'), ('Dwell Time (us)', 'dwell'), ('Settle Samples', 'settle_samples')
         ]
         num_cols = 3
         for index, (label_text, key) in enumerate(param_groups):
@@ -311,6 +361,8 @@ class GUI:
             self.param_frame.columnconfigure(col, weight=1)
             entry.bind("<FocusOut>", lambda e: self.update_config())
             entry.bind("<Return>", lambda e: self.update_config())
+            if key in acquisition.PREVIEW_KEYS:
+                entry.bind("<KeyRelease>", lambda e: acquisition.mark_param_edit(self))
 
         self.info_frame = ttk.Frame(self.param_frame)
         self.info_frame.grid(row=0, column=0, columnspan=1, sticky="ew")
@@ -324,10 +376,18 @@ class GUI:
             "• Amp X/Y and Offset X/Y: positional information for galvos in V (e.g., 0.8). \n"
             "• Steps X/Y + Extra Steps: number of divisions from left to right (e.g., 512). Note that extra steps are included within the amplitude bounds. \n"
             "• Rate: sample rate for both inputs and outputs (e.g., 1e5). \n"
-            "• Dwell time: time to spend on each pixel in s (e.g., 1e-6). Note that the fast direction continuously scans, the dwell time is not discretely applied in scanning."
+            "• Dwell time: time to spend on each pixel in s (e.g., 1e-6). Note that the fast direction continuously scans, the dwell time is not discretely applied in scanning. \n"
+            "• Settle Samples: samples dropped at the start of every pixel before averaging (e.g., 0)."
         ))
 
         ttk.Separator(self.param_frame, orient="horizontal").grid(column=0, columnspan=3, sticky="ew", pady=(10, 4))
+
+        self.bidirectional_var = tk.BooleanVar(value=self.config['bidirectional'])
+        ttk.Checkbutton(
+            self.param_frame, text='Bidirectional Scan (auto line-phase)',
+            variable=self.bidirectional_var, command=self.update_config
+        ).grid(row=98, column=0, columnspan=3, padx=5, pady=(5, 0), sticky='w')
+
         ttk.Label(self.param_frame, text="# of Input Channels:").grid(row=99, column=0, padx=5, pady=(0, 4), sticky="e")
 
         self.num_inputs_var = tk.IntVar(value=len(self.config["ai_chans"]))
@@ -347,6 +407,13 @@ class GUI:
 
         self.update_input_channel_settings()
 
+        # frame time, data volume and the best throughput change for the current parameters
+        self.scan_report_var = tk.StringVar(value='')
+        ttk.Label(self.param_frame, textvariable=self.scan_report_var, font=('Calibri', 9), wraplength=360, justify='left').grid(
+            row=101, column=0, columnspan=3, sticky='w', padx=5, pady=(0, 6)
+        )
+        self.update_scan_report()
+
 
         ###########################################################
         #################### 4. ZABER DELAY ##########################
@@ -563,9 +630,46 @@ class GUI:
         "Load a .py file as your mask with a function\n\n"
         "    def generate_mask(image: np.ndarray) -> np.ndarray:\n"
         "        return (image > threshold).astype(np.uint8)\n\n"
-        "The output must be binary and match the input shape. \n"
+        "The output must be binary and match the input shape. \n\n"
+        "Predictive Script Masks modulates each frame with the mask computed from the previous one. \n"
+        "Max stale: oldest mask (in frames) that may still be used before an extra unmodulated scan. \n"
+        "Refresh every: force that extra scan every N frames (0 = never). \n"
+        "Script budget: time a script may take per frame before its last good mask is reused. \n"
         ))
 
+        self.rpoc_mode_frame = ttk.Frame(self.rpoc_frame)
+        self.rpoc_mode_frame.grid(row=3, column=0, columnspan=4, sticky="ew", pady=(0, 4))
+        ttk.Radiobutton(
+            self.rpoc_mode_frame, text='Standard', variable=self.rpoc_mode_var, value='standard'
+        ).grid(row=0, column=0, padx=5, sticky='w')
+        ttk.Radiobutton(
+            self.rpoc_mode_frame, text='Variable Dwell', variable=self.rpoc_mode_var, value='variable'
+        ).grid(row=0, column=1, padx=5, sticky='w')
+        ttk.Label(self.rpoc_mode_frame, text='Dwell x').grid(row=0, column=2, padx=(10, 2), sticky='e')
+        self.dwell_multiplier_var = tk.StringVar(value='2.0')
+        ttk.Entry(self.rpoc_mode_frame, textvariable=self.dwell_multiplier_var, width=5).grid(row=0, column=3, sticky='w')
+
+        # script masks for frame N predicted from frame N-1, one scan per frame instead of two
+        self.predictive_mask_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            self.rpoc_mode_frame, text='Predictive Script Masks', variable=self.predictive_mask_var
+        ).grid(row=1, column=0, columnspan=2, padx=5, sticky='w')
+        ttk.Label(self.rpoc_mode_frame, text='Max stale').grid(row=1, column=2, padx=(10, 2), sticky='e')
+        self.mask_max_stale_var = tk.StringVar(value='2')
+        ttk.Entry(self.rpoc_mode_frame, textvariable=self.mask_max_stale_var, width=5).grid(row=1, column=3, sticky='w')
+        ttk.Label(self.rpoc_mode_frame, text='Refresh every').grid(row=1, column=4, padx=(10, 2), sticky='e')
+        self.mask_refresh_var = tk.StringVar(value='0')
+        ttk.Entry(self.rpoc_mode_frame, textvariable=self.mask_refresh_var, width=5).grid(row=1, column=5, sticky='w')
+
+        # .py masks run in their own worker processes, a call over budget reuses that script's last good mask
+        ttk.Label(self.rpoc_mode_frame, text='Script budget (ms)').grid(row=2, column=0, columnspan=2, padx=5, sticky='w')
+        self.mask_budget_var = tk.StringVar(value='200')
+        ttk.Entry(self.rpoc_mode_frame, textvariable=self.mask_budget_var, width=5).grid(row=2, column=2, sticky='w')
+        self.mask_stats_var = tk.StringVar(value='')
+        ttk.Label(self.rpoc_frame, textvariable=self.mask_stats_var, font=('Calibri', 9)).grid(
+            row=4, column=0, columnspan=4, sticky='w', padx=5
+        )
+
         self.update_modulation_channels()
 
         ###########################################################
@@ -697,7 +801,7 @@ class GUI:
         display_frame.rowconfigure(0, weight=1)
         display_frame.columnconfigure(0, weight=1)
 
-        self.fig = Figure(figsize=(10, 8), dpi=100)
+        self.fig = display.LiveFigure(figsize=(10, 8), dpi=100)
         self.canvas = FigureCanvasTkAgg(self.fig, master=display_frame)
         self.canvas_widget = self.canvas.get_tk_widget()
         self.canvas_widget.pack(fill=tk.BOTH, expand=True)
@@ -817,6 +921,7 @@ class GUI:
             return
         
         prior.move_z(port, z_height)
+        acquisition.mark_param_edit(self)  # focus changes get preview frames too
 
     def move_prior_stage_xy(self): #TODO: make logic kwargs consistent here
         try:
@@ -880,17 +985,17 @@ class GUI:
             messagebox.showerror("Data Error", "No valid data available. Acquire an image first.")
             return
 
+        # converted from the acquired frame itself, the display may show a preview or a subset of it
         images = []
         for i in range(np.shape(self.data)[0]):
-            plane = self.data[i]
-            norm = (plane / np.max(plane) * 255).astype(np.uint8)
-            images.append(Image.fromarray(norm).convert("RGB"))
+            images.append(Image.fromarray(to_uint8(self.data[i], flip=False)).convert("RGB"))
 
         launch_pyqt_editor(preloaded_images=images, channel_names=self.config["channel_names"])
 
     def update_modulation_channels(self):
         for child in self.mod_channels_frame.winfo_children():
             child.destroy()
+        self.close_mask_scripts()
         try:
             num = int(self.num_mod_channels_var.get())
         except ValueError:
@@ -972,6 +1077,7 @@ class GUI:
                 func = self.load_mask_script(file_path)
                 if not hasattr(self, 'mod_scripts'):
                     self.mod_scripts = {}
+                self.close_mask_scripts(idx)
                 self.mod_scripts[idx] = func
                 if hasattr(self, 'mod_masks') and idx in self.mod_masks:
                     del self.mod_masks[idx]
@@ -981,6 +1087,7 @@ class GUI:
                     self.mod_masks = {}
                 self.mod_masks[idx] = mask
                 if hasattr(self, 'mod_scripts') and idx in self.mod_scripts:
+                    self.close_mask_scripts(idx)
                     del self.mod_scripts[idx]
         except Exception as e:
             messagebox.showerror("Load Error", f"Failed to load mask or script:\n{e}")
@@ -994,12 +1101,15 @@ class GUI:
         self.mod_enabled_vars[idx].set(True)
 
     def load_mask_script(self, path):
-        spec = importlib.util.spec_from_file_location("user_mask", path)
-        user_mask = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(user_mask)
-        if not hasattr(user_mask, 'generate_mask'):
-            raise ImportError("No function `generate_mask(image_data)` found.")
-        return user_mask.generate_mask
+        # imported in a warm worker process, so a slow or crashing script can't stall the scan loop
+        return MaskScript(path)
+
+    def close_mask_scripts(self, idx=None):
+        scripts = getattr(self, 'mod_scripts', {})
+        for i in ([idx] if idx is not None else list(scripts)):
+            script = scripts.get(i)
+            if isinstance(script, MaskScript):
+                script.close()
 
     ###########################################################
     ################ CELL VIABILITY HANDELING #################
@@ -1117,6 +1227,15 @@ class GUI:
 
 
 
+    def update_scan_report(self):
+        try:
+            report = scan_throughput(self.config)
+        except Exception as e:
+            self.scan_report_var.set(f"Cannot predict the frame time: {e}")
+            return None
+        self.scan_report_var.set(format_report(report))
+        return report
+
     def update_config(self):
         for key, entry in self.param_entries.items():
             old_val = self.config[key]
@@ -1136,7 +1255,7 @@ class GUI:
                     if float_val != self.config[key]:
                         self.config[key] = float_val
 
-                elif key in ['numsteps_x', 'numsteps_y', 'extrasteps_left', 'extrasteps_right']:
+                elif key in ['numsteps_x', 'numsteps_y', 'extrasteps_left', 'extrasteps_right', 'settle_samples']:
                     int_val = int(value)
                     if int_val != self.config[key]:
                         self.config[key] = int_val
@@ -1151,6 +1270,8 @@ class GUI:
                 entry.insert(0, str(old_val))
                 return
 
+        self.config['bidirectional'] = self.bidirectional_var.get()
+
         try:
             self.config["ai_chans"] = [var.get().strip() for var in self.input_ai_vars]
             self.config["channel_names"] = [var.get().strip() for var in self.input_name_vars]
@@ -1163,6 +1284,9 @@ class GUI:
         except Exception as e:
             messagebox.showerror("Error", f"Failed to apply input channel settings:\n{e}")
             return
+
+        # the prediction depends on the number of input channels, so it waits for them
+        self.update_scan_report()
         
         if hasattr(self, "input_name_vars") and hasattr(self, "input_auto_cb_vars"):
             self.auto_colorbar_vars.clear()
@@ -1258,6 +1382,12 @@ class GUI:
 
     def close(self):
         self.running = False
+        for session in (getattr(self, 'scan_session', None), getattr(self, 'sim_session', None)):
+            if session is not None:
+                session.close()
+        if getattr(self, 'mask_predictor', None) is not None:
+            self.mask_predictor.close()
+        self.close_mask_scripts()
         self.zaber_stage.disconnect()
         self.root.quit()
         self.root.destroy()
@@ -6,6 +6,8 @@ from PyQt5.QtWidgets import (
 from PyQt5.QtGui import QPixmap, QImage, QPainter, QColor, QPen
 from PyQt5.QtCore import Qt, QTimer, QRunnable, QThread, QThreadPool, QObject, pyqtSignal, pyqtSlot
 from pyrpoc.mains import acquisition
+from pyrpoc.mains.display import display_max_fps
+from pyrpoc.helpers.frame_mailbox import FrameMailbox, poll_interval
 from pyrpoc.helpers.prior_stage.functions import *
 import numpy as np
 import random
@@ -169,6 +171,10 @@ class MosaicDialog(QDialog):
         self.setAttribute(Qt.WA_DeleteOnClose)
         self.setFocusPolicy(Qt.StrongFocus)
         self.resize(1200, 800)
+        # every tile is blended into the mosaic as it arrives, the mosaic is only redrawn on timer ticks
+        self.display_mailbox = FrameMailbox()
+        self.display_timer = QTimer(self)
+        self.display_timer.timeout.connect(self.show_latest_tile)
 
         main_layout = QHBoxLayout(self)
         self.setLayout(main_layout)
@@ -386,6 +392,8 @@ class MosaicDialog(QDialog):
         self.worker.error.connect(lambda msg: self.update_status(f"Mosaic error: {msg}"))
         self.worker.status_update.connect(self.update_status)
 
+        self.display_mailbox = FrameMailbox()
+        self.display_timer.start(poll_interval(display_max_fps(self.main_gui)))
         self.worker.start()
         self.update_status("Starting mosaic...")
 
@@ -409,10 +417,19 @@ class MosaicDialog(QDialog):
         tile_rgb = np.clip(tile_rgb, 0, 1)
 
         self.canvas.blend_tile(i, j, tile_rgb)
-        self.update_display()
+        self.display_mailbox.put((i, j))
+
+    def show_latest_tile(self):
+        if self.display_mailbox.take() is not None:
+            self.update_display()
 
     @pyqtSlot()
     def on_mosaic_complete(self):
+        self.display_timer.stop()
+        self.display_mailbox.take()
+        stats = self.display_mailbox.stats()
+        if stats['dropped']:
+            print(f"[INFO] Mosaic display skipped {stats['dropped']} of {stats['posted']} tile redraws, every tile is in the saved mosaic.")
         self.update_status("Mosaic acquisition complete.")
         self.update_display()
         self.save_mosaic()
@@ -39,7 +39,10 @@ from PyQt5.QtCore import Qt, QPointF, QRectF, QSize, QEvent, Qt, QTimer, QRunnab
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
 from pyrpoc.mains import acquisition
-from pyrpoc.helpers.galvo_funcs import Galvo
+from pyrpoc.helpers.scan_plan import get_plan
+from pyrpoc.helpers.utils import to_uint8, AutoContrast
+from pyrpoc.helpers.frame_mailbox import FrameMailbox, poll_interval
+from pyrpoc.mains.display import display_max_fps
 from pathlib import Path
 import matplotlib.pyplot as plt
 from datetime import datetime
@@ -490,6 +493,11 @@ class RealTimeTrackingDialog(QDialog):
         self.setWindowTitle("Real-Time Cell Viability Tracking")
         self.main_gui = main_gui
         self.canceled = False
+        # every frame is saved and measured as it arrives, only the newest one is drawn on each timer tick
+        self.display_mailbox = FrameMailbox()
+        self.display_timer = QTimer(self)
+        self.display_timer.timeout.connect(self.show_latest_frame)
+        self.contrast = AutoContrast()
         self.setAttribute(Qt.WA_DeleteOnClose)
         self.setFocusPolicy(Qt.StrongFocus)
         self.resize(800, 600)
@@ -1048,6 +1056,8 @@ class RealTimeTrackingDialog(QDialog):
         self.start_tracking_button.setEnabled(False)
         self.stop_tracking_button.setEnabled(True)
         
+        self.display_mailbox = FrameMailbox()
+        self.display_timer.start(poll_interval(display_max_fps(self.main_gui)))
         self.worker.start()
         self.update_status("Starting Real-time Viability Tracking...")
     
@@ -1066,9 +1076,10 @@ class RealTimeTrackingDialog(QDialog):
         """
         Combines grayscale image and RGBA overlay, then updates the display pixmap.
         """
-        # Normalize grayscale frame  to 0–255
-        raw_frame = (raw_frame - np.min(raw_frame)) / (np.max(raw_frame) - np.min(raw_frame) + 1e-8)
-        gray_img = (raw_frame * 255).astype(np.uint8)
+        # Scale grayscale frame to 0–255 between smoothed percentile limits, into the same buffer every frame
+        limits = self.contrast('tracking', raw_frame)
+        self.gray_buffer = to_uint8(raw_frame, out=getattr(self, 'gray_buffer', None), flip=False, limits=limits)
+        gray_img = self.gray_buffer
         gray_rgb = np.stack([gray_img] * 3, axis=-1)  # Convert to RGB shape (H, W, 3)
 
         # Blend overlay
@@ -1191,10 +1202,22 @@ class RealTimeTrackingDialog(QDialog):
         # Update the numpy array
         text_overlay[:] = np.array(img_pil)
         
+    def record_roi_std(self, roi_mask, subtracted_frame):
+        """
+        STD of every ROI in the subtracted image, stored for every frame whether or not it gets displayed.
+        """
+        roi_stds = {}
+        for roi_id in np.unique(roi_mask):
+            if roi_id == 0:
+                continue
+            roi_stds[roi_id] = np.std(subtracted_frame[roi_mask == roi_id])
+            self.roi_std_all[roi_id - 1].append(roi_stds[roi_id])  # Store std for this ROI
+        return roi_stds
+
     # alpha is the transparency of the ROI on images
-    def generate_overlay_from_std(self, roi_mask, subtracted_frame, low_thresh, high_thresh, colormap=cm.jet, alpha=0.5):
+    def generate_overlay_from_std(self, roi_mask, roi_stds, low_thresh, high_thresh, colormap=cm.jet, alpha=0.5):
         """
-        Generate RGBA overlay from ROI mask and subtracted image using STD and colormap.
+        Generate RGBA overlay from ROI mask and the per-ROI STDs using colormap.
         """
         h, w = roi_mask.shape
         overlay = np.zeros((h, w, 4), dtype=np.uint8)
@@ -1207,12 +1230,8 @@ class RealTimeTrackingDialog(QDialog):
         
         dark_red = np.array([139,0,0])
         dark_green = np.array([0, 100, 0])
-        for roi_id in np.unique(roi_mask):
-            if roi_id == 0:
-                continue
+        for roi_id, roi_std in roi_stds.items():
             mask = roi_mask == roi_id
-            roi_std = np.std(subtracted_frame[mask])
-            self.roi_std_all[roi_id - 1].append(roi_std)  # Store std for this ROI
             
             # check if it's over/above high/low threshold
             if roi_std > color_max:
@@ -1245,11 +1264,19 @@ class RealTimeTrackingDialog(QDialog):
             with open(save_path, "a") as f:
                 np.savetxt(f, data, fmt="%.6f",delimiter="\t")
 
-        if subtracted_frame is None:
+        roi_stds = None if subtracted_frame is None else self.record_roi_std(self.roi_mask_used, subtracted_frame)
+        self.display_mailbox.put((data, roi_stds))
+
+    def show_latest_frame(self):
+        item = self.display_mailbox.take()
+        if item is None:
+            return
+        data, roi_stds = item
+        if roi_stds is None:
             # just show the original data
             self.update_display_image(data, None)
-        else:  
-            overlay_array = self.generate_overlay_from_std(self.roi_mask_used, subtracted_frame, self.low_threshold, self.high_threshold, alpha = 0.5)
+        else:
+            overlay_array = self.generate_overlay_from_std(self.roi_mask_used, roi_stds, self.low_threshold, self.high_threshold, alpha = 0.5)
             self.update_display_image(data, overlay_array)
         
         
@@ -1291,6 +1318,11 @@ class RealTimeTrackingDialog(QDialog):
         
     @pyqtSlot()
     def on_tracking_finished(self):
+        self.display_timer.stop()
+        self.show_latest_frame()
+        stats = self.display_mailbox.stats()
+        if stats['dropped']:
+            print(f"[INFO] Tracking display skipped {stats['dropped']} of {stats['posted']} frames, all of them were still saved and measured.")
         self.update_status("Viability Tracking finished.")
         print("tracking_finished_emit_Check")
 
@@ -1347,32 +1379,44 @@ class RealTimeTrackingWorker(QThread):
                 
                 # Prepare for acquire_single
                 self.gui.update_config()
-                galvo = Galvo(self.gui.config)
                 channels = [f"{self.gui.config['device']}/{ch}" for ch in self.gui.config['ai_chans']]
-                
-                
-                acquisition.acquire_single(self.gui, channels, galvo)
-                data = getattr(self.gui, 'data', []) or []
-                frame = data[0].astype(np.float32)
-                self.frame_counter +=1
-                
-                self.frames.append(frame)
-                subtracted_frame = None
-                if len(self.frames) > self.delta_frames:
-                    frame_t = self.frames[-self.delta_frames - 1]
-                    frame_now = self.frames[-1]
-                    subtracted_frame = frame_now - frame_t
-                    self.status_update.emit(f"Subtraction based on frame:{self.frame_counter} and frame {self.frame_counter -self.delta_frames}")
-                self.frame_ready.emit(subtracted_frame,frame)
-                
-        
-                # control length of buffer to avoid overloading memory
-                if len(self.frames)>100:
-                    self.frames.pop(0)
+
+                burst = acquisition.burst_frames(self.gui) if acquisition.burst_allowed(self.gui) else 1
+                if burst > 1:
+                    # hardware-timed frame intervals, every frame is handled as soon as it is reduced
+                    def on_frame(idx, data_list):
+                        frame = acquisition.process_frame(self.gui, data_list)
+                        self.handle_frame(frame[0])
+                    if acquisition.acquire_burst(self.gui, channels, burst, on_frame) is None:
+                        break
+                    continue
+
+                galvo = get_plan(self.gui.config).galvo
+                frame = acquisition.acquire_single(self.gui, channels, galvo)
+                if frame is None:
+                    break
+                self.handle_frame(frame[0])
             
             self.finished.emit()
         except Exception as e:
             self.error.emit(str(e))
+
+    def handle_frame(self, image):
+        frame = image.astype(np.float32)
+        self.frame_counter +=1
+        
+        self.frames.append(frame)
+        subtracted_frame = None
+        if len(self.frames) > self.delta_frames:
+            frame_t = self.frames[-self.delta_frames - 1]
+            frame_now = self.frames[-1]
+            subtracted_frame = frame_now - frame_t
+            self.status_update.emit(f"Subtraction based on frame:{self.frame_counter} and frame {self.frame_counter -self.delta_frames}")
+        self.frame_ready.emit(subtracted_frame,frame)
+
+        # control length of buffer to avoid overloading memory
+        if len(self.frames)>100:
+            self.frames.pop(0)
         
         
 